@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# scripts/bench_calendar.py
+#
+# Benchmarks the market_check.py calendar on a synthetic 20-year calendar and
+# fails (exit 1) when any measurement misses its budget. Run from the repo
+# root:  python scripts/bench_calendar.py [--output bench.json] [--scale 2]
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import datetime
+import tempfile
+import statistics
+from pathlib import Path
+
+START_YEAR, END_YEAR = 2020, 2039
+
+# Budgets: ns per call for single queries, ms for snapshot load,
+# timestamps/s (minimum) for batch classification.
+BUDGETS = {
+    "day_flags_ns": 2_000,
+    "session_at_ns": 5_000,
+    "next_session_ns": 10_000,
+    "add_sessions_ns": 5_000,
+    "count_sessions_ns": 5_000,
+    "next_expiry_ns": 5_000,
+    "clock_is_live_ns": 1_000,
+    "snapshot_load_ms": 20,
+    "classify_per_s": 2_000_000,
+}
+
+
+def synthetic_holidays(seed=20):
+    rng = random.Random(seed)
+    holidays = []
+    for year in range(START_YEAR, END_YEAR + 1):
+        days = [datetime.date(year, 1, 1) + datetime.timedelta(days=i) for i in range(365)]
+        weekdays = [d for d in days if d.weekday() < 5]
+        holidays += [d.strftime("%d-%b-%y") for d in sorted(rng.sample(weekdays, 15))]
+    return holidays
+
+
+def per_call_ns(fn, args, repeat=5):
+    """Median over ``repeat`` runs of the mean ns per call across ``args``."""
+    runs = []
+    for _ in range(repeat):
+        t0 = time.perf_counter_ns()
+        for a in args:
+            fn(a)
+        runs.append((time.perf_counter_ns() - t0) / len(args))
+    return statistics.median(runs)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--scale", type=float, default=float(os.environ.get("CALENDAR_BENCH_SCALE", "1")),
+                        help="multiply every budget by this factor (slow runners)")
+    parser.add_argument("--queries", type=int, default=20_000)
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="calendar-bench-"))
+    os.environ["CALENDAR_SNAPSHOT"] = str(workdir / "calendar.bin")
+    os.environ["CALENDAR_START_YEAR"] = str(START_YEAR)
+    os.environ["CALENDAR_END_YEAR"] = str(END_YEAR)
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    import market_check as mc
+
+    mc.HOLIDAYS = synthetic_holidays()
+    results = {}
+
+    t0 = time.perf_counter()
+    mc.save_snapshot(mc.build_calendar())
+    results["snapshot_build_ms"] = (time.perf_counter() - t0) * 1e3
+
+    loads = []
+    for _ in range(5):
+        t0 = time.perf_counter_ns()
+        index = mc.load_snapshot(fingerprint=mc.calendar_fingerprint())
+        loads.append((time.perf_counter_ns() - t0) / 1e6)
+        index.close()
+    results["snapshot_load_ms"] = statistics.median(loads)
+
+    index = mc.get_calendar()
+    assert index._mapping is not None, "benchmark must run against the mmap'd snapshot"
+    seg = index.segment("NSE")
+    rng = random.Random(1)
+    first, last = index.base, index.base + index.n_days - 1
+    days = [datetime.date.fromordinal(rng.randint(first + 60, last - 60)) for _ in range(args.queries)]
+    stamps = [rng.randint(seg.opens[0], seg.closes[-1] - 86400 * 30) for _ in range(args.queries)]
+    steps = [rng.randint(-40, 40) for _ in range(args.queries)]
+
+    results["day_flags_ns"] = per_call_ns(index.day_flags, days)
+    results["session_at_ns"] = per_call_ns(seg.session_index_at, stamps)
+    results["next_session_ns"] = per_call_ns(lambda ts: seg.session(seg.next_session_index(ts)), stamps)
+    results["add_sessions_ns"] = per_call_ns(lambda k: index.add_sessions(days[k], steps[k]), range(len(days)))
+    results["count_sessions_ns"] = per_call_ns(
+        lambda k: index.count_sessions(days[k], days[k] + datetime.timedelta(days=30)), range(len(days)))
+    results["next_expiry_ns"] = per_call_ns(lambda d: index.next_expiry("NIFTY", d), days)
+
+    clock = mc.MarketClock("NSE")
+    now_ns = time.time_ns()
+    results["clock_is_live_ns"] = per_call_ns(clock.is_live, [now_ns] * args.queries)
+
+    try:
+        import numpy as np
+    except ImportError:
+        print("numpy not installed; skipping batch classification.")
+    else:
+        minute = np.timedelta64(60, "s")
+        ts = np.arange(np.datetime64(f"{START_YEAR}-01-01"), np.datetime64(f"{END_YEAR}-12-31"), minute)
+        t0 = time.perf_counter()
+        mc.classify_sessions(ts)
+        results["classify_per_s"] = len(ts) / (time.perf_counter() - t0)
+
+    failures = []
+    print(f"{'metric':<22}{'result':>16}{'budget':>16}")
+    for name, value in results.items():
+        budget = BUDGETS.get(name)
+        if budget is None:
+            status = ""
+        elif name.endswith("_per_s"):
+            budget /= args.scale
+            status = "" if value >= budget else "FAIL"
+        else:
+            budget *= args.scale
+            status = "" if value <= budget else "FAIL"
+        if status:
+            failures.append(name)
+        shown = "-" if budget is None else f"{budget:,.0f}"
+        print(f"{name:<22}{value:>16,.1f}{shown:>16}  {status}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({
+            "calendar": f"{START_YEAR}-{END_YEAR}",
+            "python": sys.version.split()[0],
+            "scale": args.scale,
+            "results": results,
+            "failures": failures,
+        }, indent=2))
+
+    index.close()
+    shutil.rmtree(workdir, ignore_errors=True)
+    if failures:
+        print(f"Budget exceeded: {', '.join(failures)}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
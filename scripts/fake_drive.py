@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+# scripts/fake_drive.py
+#
+# Offline stand-in for the slice of the Drive v3 API that runner.py uses,
+# serving a local directory, so the fetch path (cache, resume, parallel
+# sync) can be exercised and benchmarked without network or credentials:
+#
+#   python scripts/fake_drive.py DIR [--port 8765] [--latency 0.05]
+#          [--throughput 5e6] [--fail-rate 0.1] [--truncate-rate 0.1] [--seed 1]
+#
+#   DRIVE_API_BASE=http://127.0.0.1:8765/drive/v3 GDRIVE_FILE_ID=generator.py \
+#       python scripts/runner.py --download-only
+#
+# File and folder ids are paths relative to DIR, URL-quoted ("root" is DIR
+# itself). Endpoints:
+#   GET  /drive/v3/files/<id>             metadata (id, name, size, md5Checksum, ...)
+#   GET  /drive/v3/files/<id>?alt=media   content, honouring Range
+#   GET  /drive/v3/files?q='<id>' in parents   paged listing (pageSize, pageToken)
+#   GET|HEAD /raw/<path>                  the same bytes as a plain static file
+#                                         (ARTIFACT_SOURCE=http, ARTIFACT_BASE=.../raw)
+# Latency applies to every request; throughput caps each response body;
+# failures (503) and truncated bodies are injected only into content
+# responses, at the given rates.
+import os
+import re
+import sys
+import json
+import time
+import random
+import base64
+import hashlib
+import argparse
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+FOLDER_MIME = "application/vnd.google-apps.folder"
+RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)$")
+PARENTS_RE = re.compile(r"'([^']*)' in parents")
+BLOCK = 64 << 10
+
+
+class FakeDrive:
+    def __init__(self, root: Path, latency=0.0, throughput=0.0, fail_rate=0.0, truncate_rate=0.0, seed=None):
+        self.root = root.resolve()
+        self.latency = latency
+        self.throughput = throughput
+        self.fail_rate = fail_rate
+        self.truncate_rate = truncate_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.md5s = {}   # (path, mtime_ns, size) -> md5
+        self.stats = {"requests": 0, "bytes": 0, "failed": 0, "truncated": 0}
+
+    def roll(self, rate):
+        with self.lock:
+            return rate > 0 and self.rng.random() < rate
+
+    def count(self, key, n=1):
+        with self.lock:
+            self.stats[key] += n
+
+    def resolve(self, file_id):
+        """Path for an id, or None if it escapes the root or does not exist."""
+        rel = "" if file_id == "root" else urllib.parse.unquote(file_id)
+        path = (self.root / rel).resolve()
+        if path != self.root and self.root not in path.parents:
+            return None
+        return path if path.exists() else None
+
+    def file_id(self, path):
+        rel = path.relative_to(self.root).as_posix()
+        return urllib.parse.quote(rel, safe="") if rel != "." else "root"
+
+    def md5(self, path):
+        stat = path.stat()
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            digest = self.md5s.get(key)
+        if digest is None:
+            with open(path, "rb") as f:
+                digest = hashlib.file_digest(f, "md5").hexdigest()
+            with self.lock:
+                self.md5s[key] = digest
+        return digest
+
+    def metadata(self, path):
+        if path.is_dir():
+            return {"id": self.file_id(path), "name": path.name, "mimeType": FOLDER_MIME}
+        stat = path.stat()
+        return {
+            "id": self.file_id(path),
+            "name": path.name,
+            "mimeType": "application/octet-stream",
+            "size": str(stat.st_size),
+            "md5Checksum": self.md5(path),
+            "headRevisionId": f"{stat.st_mtime_ns:x}",
+            "appProperties": {},
+        }
+
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = "FakeDrive/1.0"
+    protocol_version = "HTTP/1.1"
+    drive: FakeDrive = None
+
+    def log_message(self, fmt, *args):
+        if os.environ.get("FAKE_DRIVE_VERBOSE"):
+            super().log_message(fmt, *args)
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def not_found(self):
+        self.send_json(404, {"error": {"code": 404, "message": "File not found"}})
+
+    def do_HEAD(self):
+        self.route(head=True)
+
+    def do_GET(self):
+        self.route(head=False)
+
+    def route(self, head):
+        drive = self.drive
+        drive.count("requests")
+        if drive.latency:
+            time.sleep(drive.latency)
+        url = urllib.parse.urlsplit(self.path)
+        query = dict(urllib.parse.parse_qsl(url.query))
+        if url.path.startswith("/raw/"):
+            path = drive.resolve(url.path[len("/raw/"):])
+            if path is None or not path.is_file():
+                return self.not_found()
+            return self.send_content(path, head, plain=True)
+        if url.path == "/drive/v3/files":
+            return self.send_listing(query)
+        if url.path.startswith("/drive/v3/files/"):
+            path = drive.resolve(url.path[len("/drive/v3/files/"):])
+            if path is None:
+                return self.not_found()
+            if query.get("alt") == "media":
+                if path.is_dir():
+                    return self.send_json(403, {"error": {"code": 403, "message": "Folders have no content"}})
+                return self.send_content(path, head)
+            return self.send_json(200, drive.metadata(path))
+        self.not_found()
+
+    def send_listing(self, query):
+        drive = self.drive
+        m = PARENTS_RE.search(query.get("q", ""))
+        folder = drive.resolve(m.group(1)) if m else None
+        if folder is None or not folder.is_dir():
+            return self.not_found()
+        entries = sorted(folder.iterdir())
+        size = max(1, min(1000, int(query.get("pageSize", "100"))))
+        start = int(query.get("pageToken", "0"))
+        body = {"files": [drive.metadata(p) for p in entries[start:start + size]]}
+        if start + size < len(entries):
+            body["nextPageToken"] = str(start + size)
+        self.send_json(200, body)
+
+    def send_content(self, path, head, plain=False):
+        drive = self.drive
+        if not head and drive.roll(drive.fail_rate):
+            drive.count("failed")
+            return self.send_json(503, {"error": {"code": 503, "message": "Injected failure"}})
+        total = path.stat().st_size
+        start, end, status = 0, total - 1, 200
+        m = RANGE_RE.match(self.headers.get("Range", ""))
+        if m and (m.group(1) or m.group(2)):
+            if m.group(1):
+                start = int(m.group(1))
+                end = min(int(m.group(2)), total - 1) if m.group(2) else total - 1
+            else:  # suffix range: last N bytes
+                start = max(0, total - int(m.group(2)))
+            if start >= total or start > end:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{total}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            status = 206
+        length = end - start + 1
+        self.send_response(status)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(length))
+        self.send_header("Accept-Ranges", "bytes")
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{total}")
+        if plain:
+            md5 = drive.md5(path)
+            self.send_header("ETag", f'"{md5}"')
+            self.send_header("Content-MD5", base64.b64encode(bytes.fromhex(md5)).decode())
+        self.end_headers()
+        if head:
+            return
+
+        # A truncated body stops somewhere in the middle and drops the connection
+        cut = start + drive.rng.randrange(length) if length and drive.roll(drive.truncate_rate) else None
+        sent, started = 0, time.monotonic()
+        with open(path, "rb") as f:
+            f.seek(start)
+            while sent < length:
+                n = min(BLOCK, length - sent)
+                if cut is not None:
+                    n = min(n, cut - start - sent)
+                    if n <= 0:
+                        drive.count("truncated")
+                        self.close_connection = True
+                        return
+                block = f.read(n)
+                self.wfile.write(block)
+                sent += len(block)
+                drive.count("bytes", len(block))
+                if drive.throughput:
+                    ahead = sent / drive.throughput - (time.monotonic() - started)
+                    if ahead > 0:
+                        time.sleep(ahead)
+
+
+def serve(root: Path, host="127.0.0.1", port=8765, **knobs):
+    """Start a fake Drive server on a background thread; returns the server."""
+    drive = FakeDrive(root, **knobs)
+    handler = type("BoundHandler", (Handler,), {"drive": drive})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.drive = drive
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a directory through a fake Drive v3 API.")
+    parser.add_argument("root", type=Path)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--throughput", type=float, default=0.0, help="bytes/s cap per response (0: unlimited)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of content requests answered 503")
+    parser.add_argument("--truncate-rate", type=float, default=0.0, help="fraction of content bodies cut short")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    if not args.root.is_dir():
+        print(f"ERROR: {args.root} is not a directory.", file=sys.stderr)
+        sys.exit(1)
+    server = serve(args.root, args.host, args.port, latency=args.latency, throughput=args.throughput,
+                   fail_rate=args.fail_rate, truncate_rate=args.truncate_rate, seed=args.seed)
+    host, port = server.server_address[:2]
+    print(f"Fake Drive serving {args.root.resolve()} on http://{host}:{port}")
+    print(f"  DRIVE_API_BASE=http://{host}:{port}/drive/v3   (folder id for the root: root)")
+    print(f"  ARTIFACT_SOURCE=http ARTIFACT_BASE=http://{host}:{port}/raw")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        print(f"Served: {json.dumps(server.drive.stats)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+# scripts/generator_boot.py
+#
+# Child-side bootstrap used by runner.py: runs the generator script as
+# __main__ from a code object marshalled by the runner, so CPython does not
+# recompile the main script on every start.
+#
+#   python -u generator_boot.py [--code CACHE] SCRIPT [ARGS...]
+#   python -u generator_boot.py --zygote CONTROL_FD [MODULE ...]
+#
+# In zygote mode the heavy dependencies are imported up front; each JSON
+# line on stdin then forks a warm child that runs the generator.
+#
+# With GENERATOR_PROFILE_DIR set (runner.py --profile) the generator runs
+# under stack_sampler.py.
+#
+# Only what every cold start needs is imported here; zygote-, fork- and
+# .pyz-only modules are imported where they are used.
+import os
+import sys
+import time
+import types
+import atexit
+import marshal
+import builtins
+import importlib
+import importlib.util
+
+# Printed to stderr under `-X importtime` once the bootstrap's own imports are
+# done, so runner_profile.py can leave them out of the generator's ranking.
+IMPORTTIME_MARKER = "generator_boot: bootstrap imports done"
+
+
+def load_code(script, code_path=None):
+    if code_path:
+        try:
+            with open(code_path, "rb") as f:
+                data = f.read()
+            if data[:4] == importlib.util.MAGIC_NUMBER:
+                return marshal.loads(memoryview(data)[4:])
+        except (OSError, ValueError, EOFError):
+            pass
+    with open(script, "rb") as f:
+        return compile(f.read(), script, "exec", dont_inherit=True)
+
+
+def run(script, code_path=None, argv=()):
+    """Execute ``script`` as ``__main__`` the way ``python script.py`` would."""
+    if os.environ.get("GENERATOR_PROFILE_DIR"):
+        import stack_sampler  # next to this file; sys.path[0] still points here
+        stack_sampler.start_from_env()
+    script = os.path.abspath(script)
+    pyz = script.endswith(".pyz")
+    if pyz:
+        import runpy
+    if "importtime" in sys._xoptions:
+        print(IMPORTTIME_MARKER, file=sys.stderr, flush=True)
+    if pyz:
+        sys.argv[:] = [script, *argv]
+        runpy.run_path(script, run_name="__main__")
+        return
+    code = load_code(script, code_path)
+
+    main = types.ModuleType("__main__")
+    main.__dict__.update({
+        "__file__": script,
+        "__builtins__": builtins,
+        "__cached__": None,
+    })
+    sys.modules["__main__"] = main
+    sys.argv[:] = [script, *argv]
+    sys.path[0] = os.path.dirname(script)
+    exec(code, main.__dict__)
+
+
+def preload(modules):
+    for name in modules:
+        started = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            print(f"zygote: could not preload {name}: {e}", file=sys.stderr)
+            continue
+        print(f"zygote: preloaded {name} in {time.perf_counter() - started:.2f}s", file=sys.stderr)
+
+
+def run_forked(request):
+    """Body of a forked child: never returns."""
+    import signal
+    import traceback
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.close(devnull)
+    # Output fifos opened by the runner's log pump
+    for fd, key in ((1, "stdout"), (2, "stderr")):
+        if request.get(key):
+            target = os.open(request[key], os.O_WRONLY)
+            os.dup2(target, fd)
+            os.close(target)
+    os.environ.clear()
+    os.environ.update(request.get("env", {}))
+    code = 0
+    try:
+        run(request["script"], request.get("code"), request.get("argv", ()))
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            code = e.code or 0
+        else:
+            print(e.code, file=sys.stderr)
+            code = 1
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    try:
+        atexit._run_exitfuncs()
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(code)
+
+
+def zygote(control_fd, modules):
+    """Preload ``modules`` then fork one warm child per request on stdin.
+
+    Replies on ``control_fd`` are JSON lines: ``{"pid": N}`` once a child
+    is forked and ``{"exit": N, "status": code}`` when it is reaped (codes
+    follow subprocess: negative for a signal).
+    """
+    import json
+    import selectors
+    control = os.fdopen(control_fd, "w", buffering=1)
+    preload(modules)
+    control.write(json.dumps({"ready": os.getpid()}) + "\n")
+
+    sel = selectors.DefaultSelector()
+    sel.register(sys.stdin, selectors.EVENT_READ)
+    children = set()
+    stdin_open = True
+    while stdin_open or children:
+        if stdin_open and sel.select(timeout=0.05):
+            line = sys.stdin.readline()
+            if not line:
+                stdin_open = False
+                sel.unregister(sys.stdin)
+                continue
+            request = json.loads(line)
+            pid = os.fork()
+            if pid == 0:
+                control.close()
+                run_forked(request)
+            children.add(pid)
+            control.write(json.dumps({"pid": pid}) + "\n")
+        elif not stdin_open:
+            time.sleep(0.05)
+        for pid in list(children):
+            done, status = os.waitpid(pid, os.WNOHANG)
+            if done:
+                children.discard(pid)
+                control.write(json.dumps({"exit": pid, "status": os.waitstatus_to_exitcode(status)}) + "\n")
+
+
+def main():
+    args = sys.argv[1:]
+    if args[:1] == ["--zygote"]:
+        zygote(int(args[1]), args[2:])
+        return
+    code_path = None
+    if args[:1] == ["--code"]:
+        code_path, args = args[1], args[2:]
+    if not args:
+        print("usage: generator_boot.py [--code CACHE] SCRIPT [ARGS...]", file=sys.stderr)
+        sys.exit(2)
+    run(args[0], code_path, args[1:])
+
+if __name__ == "__main__":
+    main()
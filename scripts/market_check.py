@@ -1,5 +1,8 @@
 #!/usr/bin/env python3
-import datetime, sys, os, zoneinfo
+import datetime, sys, os, time, json, zoneinfo, mmap, struct, hashlib, bisect
+from collections import namedtuple
+from array import array
+from pathlib import Path
 
 # Hardcoded NSE holidays (dd-mmm-yy format → parsed into dates)
 HOLIDAYS = [
@@ -7,43 +10,875 @@ HOLIDAYS = [
     "01-Apr-25", "10-Apr-25", "14-Apr-25", "18-Apr-25",
     "01-May-25", "12-May-25", "05-Sep-25", "08-Sep-25",
     "15-Aug-25", "27-Aug-25", "02-Oct-25", "21-Oct-25",
-    "22-Oct-25", "05-Nov-25", "25-Dec-25"
+    "22-Oct-25", "05-Nov-25", "25-Dec-25",
+    "26-Jan-26", "03-Mar-26", "26-Mar-26", "31-Mar-26",
+    "03-Apr-26", "14-Apr-26", "01-May-26", "28-May-26",
+    "26-Jun-26", "14-Sep-26", "02-Oct-26", "20-Oct-26",
+    "10-Nov-26", "24-Nov-26", "25-Dec-26",
 ]
 
+# Special / irregular sessions: (date, open, close, kind, segments). A
+# listed day replaces the regular session of the listed segments entirely,
+# so a shortened day is one entry and a split day is several; the other
+# segments keep their regular session (or stay shut on a holiday).
+EQUITY_SEGMENTS = ("NSE", "BSE", "NFO")
+SPECIAL_SESSIONS = [
+    ("02-Mar-24", "09:15", "10:00", "special", EQUITY_SEGMENTS),
+    ("02-Mar-24", "11:30", "12:30", "special", EQUITY_SEGMENTS),
+    ("01-Nov-24", "18:00", "19:00", "muhurat", EQUITY_SEGMENTS),
+    ("01-Feb-25", "09:15", "15:30", "budget", EQUITY_SEGMENTS),
+    ("21-Oct-25", "13:45", "14:45", "muhurat", EQUITY_SEGMENTS),
+]
+
+# F&O expiry rules per underlying: (effective from, expiry weekday, weekly
+# contracts listed?). Monthly expiry is the last such weekday of the month;
+# any expiry landing on a non-trading day moves to the previous session.
+EXPIRY_RULES = {
+    "NIFTY": [
+        ("01-Jan-20", "THU", True),
+        ("01-Sep-25", "TUE", True),
+    ],
+    "BANKNIFTY": [
+        ("01-Jan-20", "THU", True),
+        ("01-Sep-23", "WED", True),
+        ("20-Nov-24", "WED", False),
+        ("01-Jan-25", "THU", False),
+        ("01-Sep-25", "TUE", False),
+    ],
+    "FINNIFTY": [
+        ("01-Jan-21", "TUE", True),
+        ("20-Nov-24", "TUE", False),
+        ("01-Jan-25", "THU", False),
+        ("01-Sep-25", "TUE", False),
+    ],
+    "SENSEX": [
+        ("15-May-23", "FRI", True),
+        ("01-Jan-25", "TUE", True),
+        ("01-Sep-25", "THU", True),
+    ],
+}
+_WEEKDAYS = ("MON", "TUE", "WED", "THU", "FRI", "SAT", "SUN")
+
+# Years covered by the precompiled calendar index (inclusive). Years HOLIDAYS
+# has no list for are indexed weekday-only; check_holiday_coverage warns
+# about them, and HOLIDAY_WARN_DAYS ahead of the end of the list.
+CALENDAR_START_YEAR = int(os.environ.get("CALENDAR_START_YEAR", "2020"))
+CALENDAR_END_YEAR = int(os.environ.get("CALENDAR_END_YEAR", "2035"))
+HOLIDAY_WARN_DAYS = int(os.environ.get("HOLIDAY_WARN_DAYS", "45"))
+CALENDAR_SNAPSHOT = Path(os.environ.get(
+    "CALENDAR_SNAPSHOT",
+    Path(__file__).resolve().parent / ".calendar_cache" / "calendar.bin",
+))
+
+# Session context handed to runner.py / the generator (see session_context)
+SESSION_CONTEXT_PATH = Path(os.environ.get(
+    "SESSION_CONTEXT_PATH", Path.cwd() / ".runner_tmp" / "session_context.json"))
+
+# Regular session window (exchange local time)
+SESSION_OPEN = datetime.time(9, 15)
+SESSION_CLOSE = datetime.time(15, 30)
+
+# Exchange/segment registry: regular session template per segment. All
+# segments share the holiday index; SPECIAL_SESSIONS names the segments
+# each override applies to.
+SEGMENTS = {
+    "NSE": (SESSION_OPEN, SESSION_CLOSE),                        # NSE cash
+    "BSE": (SESSION_OPEN, SESSION_CLOSE),                        # BSE cash
+    "NFO": (SESSION_OPEN, SESSION_CLOSE),                        # NSE F&O
+    "CDS": (datetime.time(9, 0), datetime.time(17, 0)),          # currency derivatives
+    "MCX": (datetime.time(9, 0), datetime.time(23, 30)),         # commodities, evening session
+}
+DEFAULT_SEGMENT = os.environ.get("MARKET_SEGMENT", "NSE")
+
+# Per-day flags stored in the index
+DAY_SESSION = 1
+DAY_WEEKEND = 2
+DAY_HOLIDAY = 4
+DAY_SPECIAL = 8
+
+# Session kind codes stored alongside each interval
+SESSION_KINDS = ("regular", "special", "muhurat", "budget", "half")
+
+Session = namedtuple("Session", "open close kind")
+
+# Snapshot layout: header, section table, then 8-byte aligned sections.
+# Each section is a flat array that is cast straight out of the mmap.
+_MAGIC = b"PKCAL\0\0\0"
+_SNAPSHOT_VERSION = 6
+_HEADER = struct.Struct("<8sHHiI16s")   # magic, version, n_sections, base ordinal, n_days, fingerprint
+_SECTION = struct.Struct("<16s2sxxxxxxQQ")  # name, typecode, offset, item count
+
+_CALENDAR = None
+
+
+def _parse_holidays(holidays):
+    return set(datetime.datetime.strptime(h, "%d-%b-%y").date() for h in holidays)
+
+
+def __getattr__(name):
+    # HOLIDAY_DATES is only parsed when something actually asks for it;
+    # session queries go through the precompiled index instead.
+    if name == "HOLIDAY_DATES":
+        value = globals()["HOLIDAY_DATES"] = _parse_holidays(HOLIDAYS)
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _parse_special_sessions(special_sessions):
+    """``{date: {segment: sorted windows}}`` for the listed segments only."""
+    by_day = {}
+    for day, start, end, kind, segments in special_sessions:
+        window = (datetime.time.fromisoformat(start), datetime.time.fromisoformat(end), SESSION_KINDS.index(kind))
+        per_segment = by_day.setdefault(datetime.datetime.strptime(day, "%d-%b-%y").date(), {})
+        for name in segments:
+            per_segment.setdefault(name, []).append(window)
+    return {day: {name: sorted(windows) for name, windows in per_segment.items()}
+            for day, per_segment in by_day.items()}
+
+
+def calendar_fingerprint(holidays=None, start_year=None, end_year=None, special_sessions=None):
+    holidays = HOLIDAYS if holidays is None else holidays
+    start_year = CALENDAR_START_YEAR if start_year is None else start_year
+    end_year = CALENDAR_END_YEAR if end_year is None else end_year
+    special_sessions = SPECIAL_SESSIONS if special_sessions is None else special_sessions
+    segments = tuple((name, str(start), str(end)) for name, (start, end) in sorted(SEGMENTS.items()))
+    expiry_rules = tuple((name, tuple(map(tuple, rules))) for name, rules in sorted(EXPIRY_RULES.items()))
+    src = repr((_SNAPSHOT_VERSION, tuple(holidays), start_year, end_year,
+                tuple(map(tuple, special_sessions)), segments, expiry_rules, market_tz().key))
+    return hashlib.blake2b(src.encode(), digest_size=16).digest()
+
+
+class SessionIndex:
+    """Sorted, non-overlapping session intervals of one segment.
+
+    ``opens``/``closes`` are epoch seconds (close inclusive), ``kinds``
+    index SESSION_KINDS and ``days`` holds each session's trading-date
+    ordinal, so "which session contains t" is a bisect.
+    """
+
+    def __init__(self, name, opens, closes, kinds, days):
+        self.name = name
+        self.opens = opens
+        self.closes = closes
+        self.kinds = kinds
+        self.days = days
+
+    def session(self, i):
+        tz = market_tz()
+        return Session(datetime.datetime.fromtimestamp(self.opens[i], tz),
+                       datetime.datetime.fromtimestamp(self.closes[i], tz),
+                       SESSION_KINDS[self.kinds[i]])
+
+    def session_index_at(self, ts):
+        """Position of the session containing epoch ``ts``, or -1."""
+        i = bisect.bisect_right(self.opens, ts) - 1
+        if i >= 0 and ts <= self.closes[i]:
+            return i
+        return -1
+
+    def next_session_index(self, ts):
+        """Position of the first session opening strictly after ``ts``."""
+        i = bisect.bisect_right(self.opens, ts)
+        if i >= len(self.opens):
+            raise LookupError(f"no {self.name} session after {ts} in the calendar index")
+        return i
+
+    def previous_session_index(self, ts):
+        """Position of the last session closed at or before ``ts``."""
+        i = bisect.bisect_right(self.closes, ts) - 1
+        if i < 0:
+            raise LookupError(f"no {self.name} session before {ts} in the calendar index")
+        return i
+
+
+class CalendarIndex:
+    """Day-ordinal indexed trading calendar.
+
+    ``flags[i]`` holds the DAY_* bits for ``date.fromordinal(base + i)``;
+    ``prefix[i]`` counts the session days before it and ``session_days``
+    lists their offsets in order, which makes trading-day arithmetic O(1).
+    ``segments`` maps each registered segment to its SessionIndex and
+    ``expiries`` maps ``(underlying, "weekly" | "monthly")`` to a sorted
+    array of holiday-adjusted expiry date ordinals. Sections may be plain
+    arrays (freshly built) or memoryviews over a memory-mapped snapshot.
+    """
+
+    def __init__(self, base, sections, fingerprint, mapping=None):
+        self.base = base
+        self.sections = sections
+        self.flags = sections["flags"]
+        self.prefix = sections["prefix"]
+        self.session_days = sections["session_days"]
+        self.n_days = len(self.flags)
+        self.fingerprint = fingerprint
+        self._mapping = mapping
+
+        self.segments = {}
+        self.expiries = {}
+        for key in sections:
+            name, _, field = key.partition(":")
+            if field == "open":
+                self.segments[name] = SessionIndex(
+                    name, sections[key], sections[f"{name}:close"], sections[f"{name}:kind"],
+                    sections[f"{name}:day"])
+            elif name == "exp":
+                underlying, _, kind = field.partition(":")
+                self.expiries[underlying, _EXPIRY_KINDS[kind]] = sections[key]
+
+    @property
+    def first_day(self):
+        return datetime.date.fromordinal(self.base)
+
+    @property
+    def last_day(self):
+        return datetime.date.fromordinal(self.base + self.n_days - 1)
+
+    def day_flags(self, day):
+        # Outside the indexed range there are no session intervals either, so
+        # refuse rather than call a weekday a session day with no session
+        return self.flags[self._offset(day)]
+
+    def is_session_day(self, day):
+        return bool(self.day_flags(day) & DAY_SESSION)
+
+    def _offset(self, day):
+        i = day.toordinal() - self.base
+        if not 0 <= i < self.n_days:
+            raise LookupError(f"{day} is outside the calendar index {self.first_day} .. {self.last_day}")
+        return i
+
+    def session_ordinal(self, day):
+        """Number of session days in the index before ``day``.
+
+        For a session day this is its own 0-based trading-day ordinal.
+        """
+        return self.prefix[self._offset(day)]
+
+    def count_sessions(self, start, end):
+        """Session days ``d`` with ``start <= d <= end``."""
+        return max(self.prefix[self._offset(end) + 1] - self.prefix[self._offset(start)], 0)
+
+    def add_sessions(self, day, n):
+        """The session day ``n`` sessions after ``day`` (before, if negative).
+
+        A non-session ``day`` counts from the gap it sits in, so ``n=1``
+        is the next session day, ``n=-1`` the previous one and ``n=0``
+        rolls forward to the next session day.
+        """
+        i = self._offset(day)
+        k = self.prefix[i] + n
+        if n > 0 and not self.flags[i] & DAY_SESSION:
+            k -= 1
+        if not 0 <= k < len(self.session_days):
+            raise LookupError(f"{day} {n:+d} sessions falls outside the calendar index")
+        return datetime.date.fromordinal(self.base + self.session_days[k])
+
+    def expiry_table(self, underlying, kind="weekly"):
+        try:
+            return self.expiries[underlying, kind]
+        except KeyError:
+            raise KeyError(f"no {kind} expiries for {underlying!r}") from None
+
+    def next_expiry(self, underlying, day, kind="weekly"):
+        """First expiry on or after ``day``, or None past the end of the table."""
+        table = self.expiry_table(underlying, kind)
+        i = bisect.bisect_left(table, day.toordinal())
+        return datetime.date.fromordinal(table[i]) if i < len(table) else None
+
+    def is_expiry_day(self, underlying, day, kind="weekly"):
+        table = self.expiry_table(underlying, kind)
+        i = bisect.bisect_left(table, day.toordinal())
+        return i < len(table) and table[i] == day.toordinal()
+
+    def segment(self, name=None):
+        name = name or DEFAULT_SEGMENT
+        try:
+            return self.segments[name]
+        except KeyError:
+            raise KeyError(f"unknown market segment {name!r}; known: {', '.join(self.segments)}") from None
+
+    def close(self):
+        if self._mapping is not None:
+            self.segments = {}
+            for view in self.sections.values():
+                view.release()
+            self.sections = self.flags = None
+            self._mapping.close()
+            self._mapping = None
+
+
+_EXPIRY_KINDS = {"W": "weekly", "M": "monthly"}
+
+
+def _build_expiries(index, expiry_rules):
+    """Expiry ordinals per (underlying, kind) over the index range.
+
+    "weekly" lists every expiry (monthly ones included); "monthly" only the
+    last-weekday-of-month contracts.
+    """
+    tables = {}
+    for underlying, rules in expiry_rules.items():
+        rules = sorted((datetime.datetime.strptime(since, "%d-%b-%y").date().toordinal(),
+                        _WEEKDAYS.index(weekday), weekly) for since, weekday, weekly in rules)
+        starts = [since for since, _, _ in rules]
+        weekly, monthly = set(), set()
+        for ordinal in range(index.base, index.base + index.n_days):
+            k = bisect.bisect_right(starts, ordinal) - 1
+            if k < 0:
+                continue
+            _, weekday, has_weekly = rules[k]
+            day = datetime.date.fromordinal(ordinal)
+            if day.weekday() != weekday:
+                continue
+            last_of_month = (day + datetime.timedelta(days=7)).month != day.month
+            if not (has_weekly or last_of_month):
+                continue
+            # Special sessions (e.g. Muhurat) on a holiday do not carry expiries
+            while index.day_flags(day) & (DAY_WEEKEND | DAY_HOLIDAY) or not index.is_session_day(day):
+                day = index.add_sessions(day, -1)
+            weekly.add(day.toordinal())
+            if last_of_month:
+                monthly.add(day.toordinal())
+        tables[f"exp:{underlying}:W"] = memoryview(array("I", sorted(weekly)))
+        tables[f"exp:{underlying}:M"] = memoryview(array("I", sorted(monthly)))
+    return tables
+
+
+def build_calendar(holidays=None, start_year=None, end_year=None, special_sessions=None):
+    holidays = HOLIDAYS if holidays is None else holidays
+    start_year = CALENDAR_START_YEAR if start_year is None else start_year
+    end_year = CALENDAR_END_YEAR if end_year is None else end_year
+    special_sessions = SPECIAL_SESSIONS if special_sessions is None else special_sessions
+
+    holiday_dates = _parse_holidays(holidays)
+    overrides = _parse_special_sessions(special_sessions)
+    templates = {name: [(start, end, 0)] for name, (start, end) in SEGMENTS.items()}
+    tz = market_tz()
+    base = datetime.date(start_year, 1, 1).toordinal()
+    n_days = datetime.date(end_year, 12, 31).toordinal() - base + 1
+
+    flags = bytearray(n_days)
+    intervals = {name: (array("q"), array("q"), array("B"), array("I")) for name in SEGMENTS}
+    for i in range(n_days):
+        day = datetime.date.fromordinal(base + i)
+        if day.weekday() >= 5:
+            flags[i] = DAY_WEEKEND
+        elif day in holiday_dates:
+            flags[i] = DAY_HOLIDAY
+        else:
+            flags[i] = DAY_SESSION
+        regular = flags[i] & DAY_SESSION
+
+        special = overrides.get(day, {})
+        if special:
+            flags[i] |= DAY_SESSION | DAY_SPECIAL
+        elif not regular:
+            continue
+        for name, (opens, closes, kinds, days) in intervals.items():
+            windows = special.get(name) or (templates[name] if regular else ())
+            for start, end, kind in windows:
+                opens.append(int(datetime.datetime.combine(day, start, tz).timestamp()))
+                closes.append(int(datetime.datetime.combine(day, end, tz).timestamp()))
+                kinds.append(kind)
+                days.append(base + i)
+
+    prefix, session_days = array("I", [0]), array("I")
+    for i, day_flags in enumerate(flags):
+        if day_flags & DAY_SESSION:
+            session_days.append(i)
+        prefix.append(len(session_days))
+
+    sections = {
+        "flags": memoryview(flags).cast("B"),
+        "prefix": memoryview(prefix),
+        "session_days": memoryview(session_days),
+    }
+    for name, (opens, closes, kinds, days) in intervals.items():
+        sections[f"{name}:open"] = memoryview(opens)
+        sections[f"{name}:close"] = memoryview(closes)
+        sections[f"{name}:kind"] = memoryview(kinds)
+        sections[f"{name}:day"] = memoryview(days)
+    fingerprint = calendar_fingerprint(holidays, start_year, end_year, special_sessions)
+    index = CalendarIndex(base, sections, fingerprint)
+    sections.update(_build_expiries(index, EXPIRY_RULES))
+    return CalendarIndex(base, sections, fingerprint)
+
+
+def save_snapshot(index, path=None):
+    path = Path(path or CALENDAR_SNAPSHOT)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    names = list(index.sections)
+    offset = _HEADER.size + _SECTION.size * len(names)
+    table, blobs = [], []
+    for name in names:
+        view = memoryview(index.sections[name])
+        offset = (offset + 7) & ~7
+        table.append(_SECTION.pack(name.encode(), view.format.encode(), offset, len(view)))
+        blobs.append((offset, view.tobytes()))
+        offset += view.nbytes
+
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, _SNAPSHOT_VERSION, len(names),
+                             index.base, index.n_days, index.fingerprint))
+        f.write(b"".join(table))
+        for pos, blob in blobs:
+            f.write(b"\0" * (pos - f.tell()))
+            f.write(blob)
+    tmp.replace(path)
+
+
+def _check_sections(sections, n_days):
+    """Raise ValueError unless every section the current layout needs is intact."""
+    if len(sections.get("flags", ())) != n_days or len(sections.get("prefix", ())) != n_days + 1:
+        raise ValueError("snapshot is truncated")
+    if len(sections.get("session_days", ())) != sections["prefix"][n_days]:
+        raise ValueError("snapshot is truncated")
+    for name in SEGMENTS:
+        lengths = {len(sections.get(f"{name}:{field}", ())) for field in ("open", "close", "kind", "day")}
+        if len(lengths) != 1 or f"{name}:open" not in sections:
+            raise ValueError(f"snapshot section {name} is missing or truncated")
+    for underlying in EXPIRY_RULES:
+        if f"exp:{underlying}:W" not in sections or f"exp:{underlying}:M" not in sections:
+            raise ValueError(f"snapshot has no expiries for {underlying}")
+
+
+def load_snapshot(path=None, fingerprint=None):
+    """Memory-map a calendar snapshot; returns None if missing or stale."""
+    path = Path(path or CALENDAR_SNAPSHOT)
+    try:
+        with open(path, "rb") as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    view = None
+    sections = {}
+    try:
+        magic, version, n_sections, base, n_days, stored = _HEADER.unpack_from(mapping, 0)
+        if magic != _MAGIC or version != _SNAPSHOT_VERSION:
+            raise ValueError("unknown snapshot format")
+        if fingerprint is not None and stored != fingerprint:
+            raise ValueError("snapshot is stale")
+
+        view = memoryview(mapping)
+        for k in range(n_sections):
+            name, code, offset, count = _SECTION.unpack_from(mapping, _HEADER.size + k * _SECTION.size)
+            code = code.rstrip(b"\0").decode()
+            size = struct.calcsize(code)
+            if offset + count * size > len(mapping):
+                raise ValueError("snapshot is truncated")
+            sections[name.rstrip(b"\0").decode()] = view[offset:offset + count * size].cast(code)
+        _check_sections(sections, n_days)
+    except (struct.error, ValueError, TypeError, UnicodeDecodeError):
+        # Every slice exports the mapping's buffer; release them before closing it
+        for section in sections.values():
+            section.release()
+        if view is not None:
+            view.release()
+        try:
+            mapping.close()
+        except BufferError:
+            pass
+        return None
+
+    return CalendarIndex(base, sections, stored, mapping)
+
+
+def get_calendar():
+    """Process-wide calendar: mmap the snapshot, (re)building it if stale."""
+    global _CALENDAR
+    if _CALENDAR is None:
+        fingerprint = calendar_fingerprint()
+        index = load_snapshot(fingerprint=fingerprint)
+        if index is None:
+            index = build_calendar()
+            try:
+                save_snapshot(index)
+            except OSError as e:
+                print(f"WARNING: could not write calendar snapshot: {e}", file=sys.stderr)
+        _CALENDAR = index
+    return _CALENDAR
+
+
+_TZ_CACHE = {}
+
+
+def holiday_years(holidays=None):
+    holidays = HOLIDAYS if holidays is None else holidays
+    return {2000 + int(h[-2:]) for h in holidays}
 
-# Convert to datetime.date objects for current year
-HOLIDAY_DATES = set(
-    datetime.datetime.strptime(h, "%d-%b-%y").date()
-    for h in HOLIDAYS
-)
 
-def is_market_open_day():
-    tz = zoneinfo.ZoneInfo(os.environ.get("TIMEZONE", "Asia/Kolkata"))
-    now = datetime.datetime.now(tz)
+def check_holiday_coverage(day=None, warn_days=HOLIDAY_WARN_DAYS):
+    """Warn (stderr, plus an Actions annotation) if ``day`` has no holiday list
+    or the list / calendar index runs out within ``warn_days``; returns the
+    message or None.
+    """
+    day = _now().date() if day is None else day
+    years = holiday_years()
+    if day.year not in years:
+        message = (f"no NSE holiday list for {day.year}: every weekday is treated as a session; "
+                   f"add the {day.year} holidays to HOLIDAYS in market_check.py")
+    else:
+        covered_to = datetime.date(day.year, 12, 31)
+        while covered_to.year + 1 in years:
+            covered_to = covered_to.replace(year=covered_to.year + 1)
+        end = min(covered_to, get_calendar().last_day)
+        if (end - day).days >= warn_days:
+            return None
+        if end == covered_to:
+            message = f"the NSE holiday list ends on {end}; add the {end.year + 1} holidays to HOLIDAYS before then"
+        else:
+            message = f"the calendar index ends on {end}; raise CALENDAR_END_YEAR before then"
+    prefix = "::warning::" if os.environ.get("GITHUB_ACTIONS") == "true" else ""
+    print(f"{prefix}WARNING: {message}", file=sys.stderr)
+    return message
 
-    # Weekend check
-    if now.weekday() >= 5:  # 5=Saturday, 6=Sunday
-        print("Weekend detected, exiting.")
+
+def register_segment(name, open_time, close_time):
+    """Add or replace a segment template; the index is rebuilt on next use."""
+    global _CALENDAR
+    SEGMENTS[name] = (open_time, close_time)
+    _CALENDAR = None
+
+
+def session_ordinal(day):
+    return get_calendar().session_ordinal(day)
+
+
+def count_sessions(start, end):
+    return get_calendar().count_sessions(start, end)
+
+
+def add_sessions(day, n):
+    return get_calendar().add_sessions(day, n)
+
+
+def next_expiry(underlying, day=None, kind="weekly"):
+    day = _now().date() if day is None else day
+    return get_calendar().next_expiry(underlying, day, kind)
+
+
+def is_expiry_day(underlying, day=None, kind="weekly"):
+    day = _now().date() if day is None else day
+    return get_calendar().is_expiry_day(underlying, day, kind)
+
+
+def market_tz():
+    name = os.environ.get("TIMEZONE", "Asia/Kolkata")
+    tz = _TZ_CACHE.get(name)
+    if tz is None:
+        tz = _TZ_CACHE[name] = zoneinfo.ZoneInfo(name)
+    return tz
+
+
+def _now(now=None):
+    return datetime.datetime.now(market_tz()) if now is None else now.astimezone(market_tz())
+
+
+def session_at(now=None, segment=None):
+    """The Session containing ``now`` (close inclusive), or None."""
+    index = get_calendar().segment(segment)
+    i = index.session_index_at(_now(now).timestamp())
+    return None if i < 0 else index.session(i)
+
+
+def next_session(now=None, segment=None):
+    """First Session opening strictly after ``now``."""
+    index = get_calendar().segment(segment)
+    return index.session(index.next_session_index(_now(now).timestamp()))
+
+
+def previous_session(now=None, segment=None):
+    """Most recent Session that closed at or before ``now``."""
+    index = get_calendar().segment(segment)
+    return index.session(index.previous_session_index(_now(now).timestamp()))
+
+
+def market_state(segments=None, now=None):
+    """Resolve several segments at once: ``{segment: Session or None}``.
+
+    ``now`` is converted once and each segment costs a single bisect, so a
+    multi-segment loop can make one call per tick.
+    """
+    index = get_calendar()
+    ts = _now(now).timestamp()
+    state = {}
+    for name in segments or index.segments:
+        seg = index.segment(name)
+        i = seg.session_index_at(ts)
+        state[name] = None if i < 0 else seg.session(i)
+    return state
+
+
+def next_session_open(now=None, segment=None):
+    return next_session(now, segment).open
+
+
+def current_session_close(now=None, segment=None):
+    """Close of the session in progress at ``now``, or None if the market is shut."""
+    session = session_at(now, segment)
+    return None if session is None else session.close
+
+
+def previous_session_close(now=None, segment=None):
+    return previous_session(now, segment).close
+
+
+def seconds_until_open(now=None, segment=None):
+    now = _now(now)
+    if session_at(now, segment) is not None:
+        return 0.0
+    return (next_session_open(now, segment) - now).total_seconds()
+
+
+def seconds_until_close(now=None, segment=None):
+    now = _now(now)
+    close = current_session_close(now, segment)
+    return None if close is None else (close - now).total_seconds()
+
+
+def seconds_since_close(now=None, segment=None):
+    now = _now(now)
+    return (now - previous_session_close(now, segment)).total_seconds()
+
+
+def wait_until_open(max_wait=None, sleep=time.sleep, segment=None):
+    """Sleep straight to the next session open.
+
+    Returns immediately (True) when a session is already live.  Returns
+    False without sleeping if the open is more than ``max_wait`` seconds away.
+    """
+    if session_at(segment=segment) is not None:
+        return True
+    target = next_session_open(segment=segment).timestamp()
+    if max_wait is not None and target - time.time() > max_wait:
         return False
+    while (remaining := target - time.time()) > 0:
+        sleep(remaining)
+    return True
+
+
+def opens_within(max_wait, now=None, segment=None):
+    """True if a session is live or the next one opens within ``max_wait`` seconds."""
+    if session_at(now, segment) is not None:
+        return True
+    return next_session_open(now, segment).timestamp() - _now(now).timestamp() <= max_wait
+
+
+def _parse_hhmm(value):
+    return datetime.time.fromisoformat(value) if value else None
+
+
+def trade_window(session, start=None, end=None):
+    """``session`` clipped to the START_TIME_IST..END_TIME_IST window (datetimes)."""
+    tz = market_tz()
+    day = session.open.date()
+    start = max(session.open, datetime.datetime.combine(day, start, tz)) if start else session.open
+    end = min(session.close, datetime.datetime.combine(day, end, tz)) if end else session.close
+    return start, end
+
+
+class MarketClock:
+    """Per-tick session checks against precomputed epoch-nanosecond bounds.
+
+    ``refresh`` resolves today's session and the START_TIME_IST/END_TIME_IST
+    trading window once; ``is_live``/``in_window`` are then plain integer
+    comparisons against ``time.time_ns()`` until the day rolls over (or,
+    on a split-session day, until the current session closes).
+    """
+
+    def __init__(self, segment=None, start=None, end=None):
+        self.segment = segment
+        self.start = _parse_hhmm(start if start is not None else os.environ.get("START_TIME_IST"))
+        self.end = _parse_hhmm(end if end is not None else os.environ.get("END_TIME_IST"))
+        self.session = None
+        self.refresh()
+
+    def refresh(self, now_ns=None):
+        now_ns = time.time_ns() if now_ns is None else now_ns
+        tz = market_tz()
+        now = datetime.datetime.fromtimestamp(now_ns / 1e9, tz)
+        today = now.date()
+        midnight = datetime.datetime.combine(today + datetime.timedelta(days=1), datetime.time(), tz)
+        self.expires_ns = int(midnight.timestamp()) * 1_000_000_000
+
+        # Session in progress, else the next one if it still opens today
+        seg = get_calendar().segment(self.segment)
+        ts = now_ns // 1_000_000_000
+        i = seg.session_index_at(ts)
+        if i < 0:
+            i = bisect.bisect_right(seg.opens, ts)
+        session = seg.session(i) if i < len(seg.opens) else None
+        if session is None or session.open.date() != today:
+            self.session = None
+            self.open_ns, self.close_ns = 1, 0
+            self.window_start_ns, self.window_end_ns = 1, 0
+            return self
+
+        self.session = session
+        self.open_ns = int(session.open.timestamp()) * 1_000_000_000
+        self.close_ns = int(session.close.timestamp()) * 1_000_000_000 + 999_999_999
+        start, end = trade_window(session, self.start, self.end)
+        self.window_start_ns = int(start.timestamp()) * 1_000_000_000
+        self.window_end_ns = int(end.timestamp()) * 1_000_000_000 + 999_999_999
+        if i + 1 < len(seg.opens) and seg.opens[i + 1] < self.expires_ns // 1_000_000_000:
+            # Another session later today: re-resolve once this one is over
+            self.expires_ns = self.close_ns + 1
+        return self
+
+    def is_live(self, now_ns=None):
+        now_ns = time.time_ns() if now_ns is None else now_ns
+        if now_ns >= self.expires_ns:
+            self.refresh(now_ns)
+        return self.open_ns <= now_ns <= self.close_ns
+
+    def in_window(self, now_ns=None):
+        """True inside today's session clipped to START_TIME_IST..END_TIME_IST."""
+        now_ns = time.time_ns() if now_ns is None else now_ns
+        if now_ns >= self.expires_ns:
+            self.refresh(now_ns)
+        return self.window_start_ns <= now_ns <= self.window_end_ns
+
+    def seconds_until_close(self, now_ns=None):
+        now_ns = time.time_ns() if now_ns is None else now_ns
+        if not self.is_live(now_ns):
+            return None
+        return (self.close_ns - now_ns) / 1e9
+
 
-    # NSE holidays check
-    if now.date() in HOLIDAY_DATES:
+def classify_sessions(timestamps, segment=None):
+    """Vectorised session labelling for an array of timestamps.
+
+    ``timestamps`` is anything ``numpy.asarray`` turns into ``datetime64``;
+    naive values are taken as UTC, as numpy does.  Returns ``(mask, ids)``
+    where ``mask`` is True for instants inside a session (same interval
+    index as ``session_at``) and ``ids`` holds the session's trading-date
+    ordinal, or -1 outside a session.
+    """
+    import numpy as np
+
+    index = get_calendar().segment(segment)
+    ts = np.asarray(timestamps, dtype="datetime64[s]")
+    secs = ts.astype(np.int64)
+    opens = np.frombuffer(index.opens, dtype=np.int64)
+    closes = np.frombuffer(index.closes, dtype=np.int64)
+
+    i = np.searchsorted(opens, secs, side="right") - 1
+    safe = np.clip(i, 0, max(len(opens) - 1, 0))
+    mask = (i >= 0) & (secs <= closes[safe]) & ~np.isnat(ts)
+
+    # The session's own date from the index, not one derived with today's UTC offset
+    days = np.frombuffer(index.days, dtype=np.uint32).astype(np.int64)
+    ids = np.where(mask, days[safe], -1)
+    return mask, ids
+
+
+def is_market_open_day(segment=None):
+    now = datetime.datetime.now(market_tz())
+    flags = get_calendar().day_flags(now.date())
+
+    if not flags & DAY_SESSION:
+        # Weekend check
+        if flags & DAY_WEEKEND:
+            print("Weekend detected, exiting.")
+            return False
+
+        # NSE holidays check
         print(f"Holiday detected: {now.strftime('%d-%b-%y')}, exiting.")
         return False
 
-    # Market hours check
-    market_open = now.replace(hour=9, minute=15, second=0, microsecond=0)
-    market_close = now.replace(hour=15, minute=30, second=0, microsecond=0)
-    if not (market_open <= now <= market_close):
+    # Market hours check (regular window or the day's special sessions)
+    session = session_at(now, segment)
+    if session is None:
         print("Market is closed (outside hours).")
         return False
 
-    print("Market is open.")
+    if session.kind != "regular":
+        print(f"Market is open ({session.kind} session).")
+    else:
+        print("Market is open.")
     return True
 
+def session_context(market_open, segment=None, underlying=None):
+    """Everything downstream needs about today's session, as plain values.
+
+    Epochs are integer UTC seconds; when the market is shut the session
+    fields describe the next session instead.
+    """
+    segment = segment or DEFAULT_SEGMENT
+    clock = MarketClock(segment)
+    session = clock.session or next_session(segment=segment)
+    now_ns = time.time_ns()
+    window = trade_window(session, clock.start, clock.end)
+
+    underlying = underlying or os.environ.get("EXPIRY_UNDERLYING") or os.environ.get("TICKER", "")
+    if underlying.upper() not in EXPIRY_RULES:
+        underlying = "NIFTY"
+    session_day = session.open.date()
+    expiry = next_expiry(underlying.upper(), session_day)
+
+    return {
+        "market_open": bool(market_open),
+        "segment": segment,
+        "timezone": market_tz().key,
+        "session_type": session.kind,
+        "session_date": session_day.isoformat(),
+        "session_open_epoch": int(session.open.timestamp()),
+        "session_close_epoch": int(session.close.timestamp()),
+        "trade_start_epoch": int(window[0].timestamp()),
+        "trade_end_epoch": int(window[1].timestamp()),
+        "minutes_remaining": max(int((clock.close_ns - now_ns) // 60_000_000_000), 0) if clock.is_live(now_ns) else 0,
+        "trading_day_ordinal": session_ordinal(session_day),
+        "expiry_underlying": underlying.upper(),
+        "next_expiry": expiry.isoformat() if expiry else "",
+        "days_to_expiry": count_sessions(session_day, expiry) - 1 if expiry else -1,
+    }
+
+
+def export_session_context(context, path=None):
+    path = Path(path or SESSION_CONTEXT_PATH)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(context, separators=(",", ":")))
+    tmp.replace(path)
+    return path
+
+
 if __name__ == "__main__":
-    market_open = is_market_open_day()
-    
+    if "--build-calendar" in sys.argv[1:]:
+        index = build_calendar()
+        save_snapshot(index)
+        print(f"Calendar snapshot {index.first_day} .. {index.last_day} written to {CALENDAR_SNAPSHOT}")
+        sys.exit(0)
+
+    check_holiday_coverage()
+
+    if "--wait-until-open" in sys.argv[1:]:
+        # Absorb cron jitter the other way round: if the job fired before the
+        # bell on a trading day, sleep to the open instead of skipping the day.
+        max_wait = float(os.environ.get("MARKET_WAIT_MAX_SECONDS", "3600"))
+        wait_until_open(max_wait=max_wait)
+
+    if "--pre-open" in sys.argv[1:]:
+        # Gate the day only; `runner.py --run --wait-until-open` sleeps to the
+        # bell itself while its warm interpreter preloads.
+        max_wait = float(os.environ.get("MARKET_WAIT_MAX_SECONDS", "3600"))
+        market_open = opens_within(max_wait)
+        if market_open and session_at() is None:
+            print(f"Market opens at {next_session_open():%H:%M}; the runner waits for the bell.")
+        elif not market_open:
+            is_market_open_day()  # prints why: weekend, holiday or outside hours
+    else:
+        market_open = is_market_open_day()
+    context = session_context(market_open)
+    context_path = export_session_context(context)
+
     # Write output for GitHub Actions
     with open(os.environ["GITHUB_OUTPUT"], "a") as f:
         f.write(f"market_open={str(market_open).lower()}\n")
+        for key, value in context.items():
+            if key != "market_open":
+                f.write(f"{key}={value}\n")
+        f.write(f"session_context_path={context_path}\n")
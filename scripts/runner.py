@@ -1,19 +1,113 @@
 # scripts/runner.py
 import os
+import re
 import sys
 import json
 import base64
+import time
+import random
+import shutil
+import marshal
+import signal
+import hashlib
+import selectors
+import zipfile
+import importlib.util
 import argparse
+import threading
+import contextlib
 import subprocess
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
+# Drive is called over plain REST through one AuthorizedSession; google-auth
+# is imported lazily and googleapiclient is never needed.
 
 SCOPES = ["https://www.googleapis.com/auth/drive.readonly"]
+GOOGLE_DRIVE_API = "https://www.googleapis.com/drive/v3"
+
+# Artifact source: "drive" (Drive v3 API at DRIVE_API_BASE, e.g. a local
+# scripts/fake_drive.py), "http" (plain files under the ARTIFACT_BASE URL)
+# or "local" (files under the ARTIFACT_BASE directory). For http/local,
+# GDRIVE_FILE_ID / GDRIVE_FOLDER_ID are paths relative to ARTIFACT_BASE.
+ARTIFACT_SOURCE = os.environ.get("ARTIFACT_SOURCE", "drive")
+ARTIFACT_BASE = os.environ.get("ARTIFACT_BASE")
+DRIVE_API_BASE = os.environ.get("DRIVE_API_BASE", GOOGLE_DRIVE_API).rstrip("/")
+DRIVE_FILES_URL = f"{DRIVE_API_BASE}/files"
+METADATA_FIELDS = "id,name,size,md5Checksum,headRevisionId,appProperties"
+FOLDER_MIME = "application/vnd.google-apps.folder"
+
+# Content-addressed artifact cache: objects/<md5Checksum>
+CACHE_DIR = Path(os.environ.get("RUNNER_CACHE_DIR", Path.cwd() / ".runner_cache"))
+CACHE_MAX_AGE = float(os.environ.get("RUNNER_CACHE_MAX_AGE", str(14 * 86400)))
+
+# Bounded parallelism for multi-file bundle syncs (GDRIVE_FOLDER_ID)
+SYNC_WORKERS = int(os.environ.get("RUNNER_SYNC_WORKERS", "4"))
+
+# Resumable downloads: retry budget, backoff cap and adaptive chunk bounds
+DOWNLOAD_RETRIES = int(os.environ.get("RUNNER_DOWNLOAD_RETRIES", "6"))
+BACKOFF_BASE, BACKOFF_MAX = 0.5, 30.0
+CHUNK_MIN, CHUNK_START, CHUNK_MAX = 256 << 10, 1 << 20, 64 << 20
+CHUNK_TARGET_SECONDS = 2.0
+
+# Integrity pinning: expected SHA-256 / detached signature for the generator
+# (env wins over Drive appProperties "sha256"/"signature"); a pinned public
+# key makes a valid signature mandatory.
+PUBKEY_PATH = Path(os.environ.get("GENERATOR_PUBKEY_PATH", Path(__file__).resolve().parent / "generator_pubkey.pem"))
+
+# Warm start: modules the zygote imports before the generator is forked
+PRELOAD_MODULES = os.environ.get(
+    "RUNNER_PRELOAD", "growwapi,gspread,googleapiclient.discovery,requests,pyotp").split(",")
+
+# Crash restarts: bounded exponential backoff, only until END_TIME_IST; a run
+# longer than RESTART_STABLE_SECONDS resets the backoff
+RESTART_MAX = int(os.environ.get("RUNNER_MAX_RESTARTS", "5"))
+RESTART_BACKOFF_BASE, RESTART_BACKOFF_MAX = 2.0, 120.0
+RESTART_STABLE_SECONDS = 600
+CHECKPOINT_DIR = Path(os.environ.get("GENERATOR_CHECKPOINT_DIR", Path.cwd() / ".runner_tmp" / "checkpoints"))
+
+# --profile: collapsed-stack files from the in-child sampler (stack_sampler.py)
+PROFILE_DIR = Path(os.environ.get("RUNNER_PROFILE_DIR", Path.cwd() / ".runner_tmp" / "profiles"))
+PROFILE_INTERVAL = os.environ.get("RUNNER_PROFILE_INTERVAL", "0.01")
+PROFILE_WINDOW = os.environ.get("RUNNER_PROFILE_WINDOW", "300")
+
+# Child resource telemetry from /proc (0 disables)
+TELEMETRY_INTERVAL = float(os.environ.get("RUNNER_TELEMETRY_INTERVAL", "5"))
+TELEMETRY_PATH = Path(os.environ.get("RUNNER_TELEMETRY_PATH", Path.cwd() / ".runner_tmp" / "telemetry.jsonl"))
+
+# Process-wide Drive clients, built lazily on first use
+_CLIENT_LOCK = threading.Lock()
+_CREDENTIALS = None
+_SESSION = None
+_SOURCE = None
+
+# Set by --startup-profile (runner_profile.StartupProfile)
+_PROFILE = None
+
+def phase(name: str):
+    """Time a runner phase when --startup-profile is on."""
+    return _PROFILE.phase(name) if _PROFILE is not None else contextlib.nullcontext()
+
+# A --run within this many seconds of the fetch reuses the artifact as is
+MANIFEST_MAX_AGE = float(os.environ.get("RUNNER_MANIFEST_MAX_AGE", "900"))
+
+def get_credentials():
+    """Service-account credentials, decoded once per process.
+
+    The same object backs every session, so its access token is reused
+    until it expires and google-auth refreshes it.
+    """
+    global _CREDENTIALS
+    with _CLIENT_LOCK:
+        if _CREDENTIALS is None:
+            with phase("credential decode"):
+                _CREDENTIALS = load_credentials()
+        return _CREDENTIALS
+
+def load_credentials():
+    from google.oauth2.service_account import Credentials
 
-def get_service():
     sa_json = os.environ.get("GCP_SERVICE_ACCOUNT_JSON")
     if not sa_json:
         print("ERROR: GCP_SERVICE_ACCOUNT_JSON not found in env.", file=sys.stderr)
@@ -28,53 +122,1031 @@ def get_service():
         print(f"ERROR: invalid service account JSON: {e}", file=sys.stderr)
         sys.exit(1)
 
-    creds = Credentials.from_service_account_info(info, scopes=SCOPES)
-    return build("drive", "v3", credentials=creds)
+    return Credentials.from_service_account_info(info, scopes=SCOPES)
+
+def get_session():
+    """Shared AuthorizedSession with a keep-alive connection pool.
+
+    Metadata calls, folder listings and every parallel download go
+    through this one session.
+    """
+    global _SESSION
+    if _SESSION is None:
+        # No auth for plain HTTP sources, nor for a Drive stand-in without a service account
+        anonymous = ARTIFACT_SOURCE != "drive" or (
+            DRIVE_API_BASE != GOOGLE_DRIVE_API and not os.environ.get("GCP_SERVICE_ACCOUNT_JSON"))
+        creds = None if anonymous else get_credentials()
+        with _CLIENT_LOCK, phase("session build"):
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            if _SESSION is None:
+                if anonymous:
+                    session = requests.Session()
+                else:
+                    from google.auth.transport.requests import AuthorizedSession
+                    session = AuthorizedSession(creds)
+                adapter = HTTPAdapter(pool_connections=2, pool_maxsize=SYNC_WORKERS + 2)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _SESSION = session
+    return _SESSION
 
-def download_file(file_id: str, dest: Path):
-    svc = get_service()
-    request = svc.files().get_media(fileId=file_id)
+class DriveSource:
+    """Drive v3 API at DRIVE_API_BASE (Google, or a stand-in like scripts/fake_drive.py)."""
+
+    def metadata(self, file_id: str) -> dict:
+        session = get_session()
+        resp = session.get(f"{DRIVE_FILES_URL}/{file_id}",
+                           params={"fields": METADATA_FIELDS, "supportsAllDrives": "true"})
+        resp.raise_for_status()
+        return resp.json()
+
+    def list(self, folder_id: str, prefix: str = "") -> dict:
+        session = get_session()
+        files, page_token = {}, None
+        while True:
+            params = {
+                "q": f"'{folder_id}' in parents and trashed = false",
+                "fields": f"nextPageToken,files({METADATA_FIELDS},mimeType)",
+                "pageSize": "1000",
+                "supportsAllDrives": "true",
+                "includeItemsFromAllDrives": "true",
+            }
+            if page_token:
+                params["pageToken"] = page_token
+            resp = session.get(DRIVE_FILES_URL, params=params)
+            resp.raise_for_status()
+            body = resp.json()
+            for item in body.get("files", []):
+                rel = f"{prefix}{item['name']}"
+                if item.get("mimeType") == FOLDER_MIME:
+                    files.update(self.list(item["id"], f"{rel}/"))
+                else:
+                    files[rel] = item
+            page_token = body.get("nextPageToken")
+            if not page_token:
+                return files
+
+    def download(self, file_id: str, dest: Path, meta: dict = None) -> dict:
+        params = {"alt": "media", "supportsAllDrives": "true"}
+        return download_ranged(f"{DRIVE_FILES_URL}/{file_id}", params, file_id, dest, meta)
+
+class HttpSource:
+    """Plain files under a base URL (static server, CDN, object store).
+
+    Metadata comes from a HEAD request: size from Content-Length, md5 from
+    Content-MD5 or an md5-style ETag. A folder is described by
+    ``<folder>/index.json``: ``{"relative/path": {"size": N, "md5": "..."}}``.
+    """
+
+    def __init__(self, base: str):
+        self.base = base.rstrip("/")
+
+    def url(self, path: str) -> str:
+        return f"{self.base}/{urllib.parse.quote(path)}"
+
+    def metadata(self, file_id: str) -> dict:
+        resp = get_session().head(self.url(file_id), allow_redirects=True, timeout=(10, 60))
+        resp.raise_for_status()
+        headers = resp.headers
+        etag = headers.get("ETag", "").removeprefix("W/").strip('"')
+        meta = {"id": file_id, "name": file_id.rsplit("/", 1)[-1],
+                "headRevisionId": etag or headers.get("Last-Modified")}
+        if headers.get("Content-Length"):
+            meta["size"] = headers["Content-Length"]
+        if headers.get("Content-MD5"):
+            meta["md5Checksum"] = base64.b64decode(headers["Content-MD5"]).hex()
+        elif re.fullmatch(r"[0-9a-f]{32}", etag):
+            meta["md5Checksum"] = etag
+        return meta
+
+    def list(self, folder_id: str) -> dict:
+        resp = get_session().get(self.url(f"{folder_id}/index.json"), timeout=(10, 60))
+        resp.raise_for_status()
+        files = {}
+        for rel, info in resp.json().items():
+            meta = {"id": f"{folder_id}/{rel}", "name": rel.rsplit("/", 1)[-1]}
+            if info.get("size") is not None:
+                meta["size"] = str(info["size"])
+            if info.get("md5"):
+                meta["md5Checksum"] = info["md5"]
+            files[rel] = meta
+        return files
+
+    def download(self, file_id: str, dest: Path, meta: dict = None) -> dict:
+        return download_ranged(self.url(file_id), {}, file_id, dest, meta)
+
+class LocalSource:
+    """Files under a local directory: offline runs and fetch-path benchmarks."""
+
+    def __init__(self, base: str):
+        self.base = Path(base)
+
+    def metadata(self, file_id: str) -> dict:
+        path = self.base / file_id
+        stat = path.stat()
+        return {"id": file_id, "name": path.name, "size": str(stat.st_size),
+                "md5Checksum": file_md5(path), "headRevisionId": str(stat.st_mtime_ns)}
+
+    def list(self, folder_id: str) -> dict:
+        root = self.base / folder_id
+        return {path.relative_to(root).as_posix(): self.metadata(path.relative_to(self.base).as_posix())
+                for path in sorted(root.rglob("*")) if path.is_file()}
+
+    def download(self, file_id: str, dest: Path, meta: dict = None) -> dict:
+        hashers = {"md5": hashlib.md5(), "sha256": hashlib.sha256()}
+        tmp = dest.with_suffix(".tmp")
+        with open(self.base / file_id, "rb") as src, open(tmp, "wb") as out:
+            while block := src.read(1 << 20):
+                out.write(block)
+                for h in hashers.values():
+                    h.update(block)
+        try:
+            verify_integrity(file_id, meta or {}, hashers)
+        except IntegrityError:
+            tmp.unlink(missing_ok=True)
+            raise
+        tmp.replace(dest)
+        return {name: h.hexdigest() for name, h in hashers.items()}
+
+SOURCES = {"drive": DriveSource, "http": HttpSource, "local": LocalSource}
+
+def get_source():
+    """The artifact source selected by ARTIFACT_SOURCE, built once per process."""
+    global _SOURCE
+    if _SOURCE is None:
+        factory = SOURCES.get(ARTIFACT_SOURCE)
+        if factory is None:
+            print(f"ERROR: unknown ARTIFACT_SOURCE {ARTIFACT_SOURCE!r} (expected one of {', '.join(SOURCES)}).",
+                  file=sys.stderr)
+            sys.exit(1)
+        if factory is DriveSource:
+            _SOURCE = factory()
+        elif not ARTIFACT_BASE:
+            print(f"ERROR: ARTIFACT_SOURCE={ARTIFACT_SOURCE} needs ARTIFACT_BASE.", file=sys.stderr)
+            sys.exit(1)
+        else:
+            _SOURCE = factory(ARTIFACT_BASE)
+    return _SOURCE
+
+def source_label() -> str:
+    if ARTIFACT_SOURCE == "drive":
+        return "Google Drive" if DRIVE_API_BASE == GOOGLE_DRIVE_API else DRIVE_API_BASE
+    return ARTIFACT_BASE or ARTIFACT_SOURCE
+
+def fetch_metadata(file_id: str) -> dict:
+    """Artifact metadata (md5Checksum, headRevisionId, size) from the configured source."""
+    return get_source().metadata(file_id)
+
+def list_folder(folder_id: str) -> dict:
+    """Recursively list a folder as ``{relative/path: metadata}``."""
+    return get_source().list(folder_id)
+
+class TransientDownloadError(Exception):
+    pass
+
+class IntegrityError(Exception):
+    pass
+
+def pinned_public_key():
+    pem = os.environ.get("GENERATOR_PUBKEY")
+    if pem:
+        return pem.encode()
+    try:
+        return PUBKEY_PATH.read_bytes()
+    except OSError:
+        return None
+
+def verify_signature(pem: bytes, signature_b64: str, digest: bytes):
+    """Check a detached RSA (PKCS#1 v1.5) or ECDSA signature over a SHA-256 digest."""
+    from cryptography.exceptions import InvalidSignature
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec, padding, rsa, utils
+
+    key = serialization.load_pem_public_key(pem)
+    prehashed = utils.Prehashed(hashes.SHA256())
+    signature = base64.b64decode(signature_b64)
+    try:
+        if isinstance(key, rsa.RSAPublicKey):
+            key.verify(signature, digest, padding.PKCS1v15(), prehashed)
+        elif isinstance(key, ec.EllipticCurvePublicKey):
+            key.verify(signature, digest, ec.ECDSA(prehashed))
+        else:
+            raise IntegrityError(f"unsupported public key type {type(key).__name__}")
+    except InvalidSignature:
+        raise IntegrityError("signature does not match the pinned public key") from None
+
+def verify_integrity(file_id: str, meta: dict, hashers: dict):
+    """Compare streamed digests with Drive's md5 and any pinned SHA-256/signature."""
+    props = meta.get("appProperties") or {}
+    expected_sha, signature = props.get("sha256"), props.get("signature")
+    if file_id == os.environ.get("GDRIVE_FILE_ID"):
+        expected_sha = os.environ.get("GENERATOR_SHA256") or expected_sha
+        signature = os.environ.get("GENERATOR_SIGNATURE") or signature
+
+    md5 = hashers["md5"].hexdigest()
+    if meta.get("md5Checksum") and md5 != meta["md5Checksum"]:
+        raise IntegrityError(f"md5 mismatch for {file_id}: expected {meta['md5Checksum']}, got {md5}")
+    sha = hashers["sha256"].hexdigest()
+    if expected_sha and sha != expected_sha.lower():
+        raise IntegrityError(f"sha256 mismatch for {file_id}: expected {expected_sha}, got {sha}")
+    pem = pinned_public_key()
+    if pem is not None:
+        if not signature:
+            raise IntegrityError(f"no signature for {file_id} but a public key is pinned")
+        verify_signature(pem, signature, hashers["sha256"].digest())
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff."""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+def download_file(file_id: str, dest: Path, meta: dict = None) -> dict:
+    """Download ``file_id`` from the configured source; returns hex digests."""
+    return get_source().download(file_id, dest, meta)
+
+def download_ranged(url: str, params: dict, file_id: str, dest: Path, meta: dict = None) -> dict:
+    """Download with HTTP Range requests, resuming from a checkpoint.
+
+    Bytes land in ``<dest>.tmp``; ``<dest>.tmp.ckpt`` records how many of
+    them are good and which revision they belong to, so a later attempt
+    (in this process or the next run) continues instead of starting over.
+    Chunk size follows measured throughput; transient failures back off
+    with jitter and shrink the chunk.  MD5/SHA-256 are updated as each
+    block is written and checked before the file is renamed into place;
+    returns the hex digests.
+    """
+    session = get_session()
+    meta = meta or {}
+    revision = meta.get("md5Checksum") or meta.get("headRevisionId")
+    total = int(meta["size"]) if meta.get("size") else None
 
     tmp = dest.with_suffix(".tmp")
-    with open(tmp, "wb") as f:
-        downloader = MediaIoBaseDownload(f, request)
-        done = False
-        while not done:
-            status, done = downloader.next_chunk()
-            if status:
-                print(f"Download progress: {int(status.progress() * 100)}%")
+    ckpt = tmp.with_name(tmp.name + ".ckpt")
+    offset = 0
+    try:
+        state = json.loads(ckpt.read_text())
+        if state.get("file_id") == file_id and revision and state.get("revision") == revision:
+            offset = min(int(state["bytes"]), tmp.stat().st_size)
+    except (OSError, ValueError, KeyError):
+        pass
+    hashers = {"md5": hashlib.md5(), "sha256": hashlib.sha256()}
+    if offset:
+        print(f"Resuming download of {file_id} at byte {offset}.")
+        # Digest state is not checkpointable; re-hash only the resumed prefix
+        with open(tmp, "rb") as f:
+            remaining = offset
+            while remaining:
+                block = f.read(min(remaining, 1 << 20))
+                remaining -= len(block)
+                for h in hashers.values():
+                    h.update(block)
+
+    chunk, attempt = CHUNK_START, 0
+    with open(tmp, "r+b" if offset else "wb") as f:
+        f.truncate(offset)
+        f.seek(offset)
+        while total is None or offset < total:
+            end = offset + chunk - 1 if total is None else min(offset + chunk, total) - 1
+            started, got = time.monotonic(), 0
+            try:
+                resp = session.get(url, params=params, headers={"Range": f"bytes={offset}-{end}"},
+                                   stream=True, timeout=(10, 60))
+                if resp.status_code == 416 and total is None:
+                    break
+                if resp.status_code == 429 or resp.status_code >= 500:
+                    raise TransientDownloadError(f"HTTP {resp.status_code}")
+                resp.raise_for_status()
+                if resp.status_code == 200 and offset:
+                    # Server ignored the range: start again from the top
+                    f.seek(0)
+                    f.truncate()
+                    offset = 0
+                    hashers = {"md5": hashlib.md5(), "sha256": hashlib.sha256()}
+                content_range = resp.headers.get("Content-Range", "")
+                if total is None and "/" in content_range and not content_range.endswith("/*"):
+                    total = int(content_range.rsplit("/", 1)[1])
+                for block in resp.iter_content(64 << 10):
+                    f.write(block)
+                    for h in hashers.values():
+                        h.update(block)
+                    got += len(block)
+            except Exception as e:
+                from requests.exceptions import ChunkedEncodingError, ConnectionError, Timeout
+                if not isinstance(e, (TransientDownloadError, ChunkedEncodingError, ConnectionError, Timeout)):
+                    raise
+                # Keep whatever arrived intact; the next range starts after it
+                offset += got
+                f.flush()
+                ckpt.write_text(json.dumps({"file_id": file_id, "revision": revision, "bytes": offset}))
+                if attempt >= DOWNLOAD_RETRIES:
+                    raise RuntimeError(f"download of {file_id} failed after {attempt} retries: {e}") from e
+                delay = backoff_delay(attempt)
+                attempt += 1
+                chunk = max(CHUNK_MIN, chunk // 2)
+                print(f"Download error ({e}); retry {attempt}/{DOWNLOAD_RETRIES} in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+
+            offset += got
+            f.flush()
+            ckpt.write_text(json.dumps({"file_id": file_id, "revision": revision, "bytes": offset}))
+            attempt = 0
+            elapsed = max(time.monotonic() - started, 1e-3)
+            chunk = int(min(CHUNK_MAX, max(CHUNK_MIN, got / elapsed * CHUNK_TARGET_SECONDS)))
+            if total:
+                print(f"Download progress: {int(offset * 100 / total)}%")
+            if resp.status_code == 200 or got == 0:
+                total = offset
+    ckpt.unlink(missing_ok=True)
+    try:
+        verify_integrity(file_id, meta, hashers)
+    except IntegrityError:
+        tmp.unlink(missing_ok=True)
+        raise
+    tmp.replace(dest)
+    return {name: h.hexdigest() for name, h in hashers.items()}
+
+def file_md5(path: Path) -> str:
+    h = hashlib.md5()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def verify_file(path: Path, file_id: str, meta: dict) -> bool:
+    """Re-hash a file already on disk and run the same checks as a download.
+
+    Cache objects and manifest reuse are trusted by name and size alone
+    otherwise, and ``.runner_cache`` is restored from ``actions/cache``, so
+    every artifact is checked against the md5/SHA-256/signature pins before
+    it can be executed.
+    """
+    hashers = {"md5": hashlib.md5(), "sha256": hashlib.sha256()}
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            for h in hashers.values():
+                h.update(block)
+    try:
+        verify_integrity(file_id, meta, hashers)
+    except IntegrityError as e:
+        print(f"WARNING: {e}; not reusing {path.name}.", file=sys.stderr)
+        return False
+    return True
+
+def place_file(src: Path, dest: Path):
+    """Atomically expose ``src`` at ``dest`` (hard link when possible)."""
+    try:
+        if os.path.samefile(src, dest):
+            # Already linked; rename() onto the same inode is a no-op and
+            # would leave the .tmp link behind
+            return
+    except FileNotFoundError:
+        pass
+    tmp = dest.with_name(dest.name + ".tmp")
+    tmp.unlink(missing_ok=True)
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copyfile(src, tmp)
     tmp.replace(dest)
 
+def prune_cache(objects: Path, max_age: float = CACHE_MAX_AGE):
+    """Drop objects not used (hits touch them) within ``max_age`` seconds."""
+    cutoff = time.time() - max_age
+    for entry in objects.iterdir():
+        try:
+            if entry.stat().st_mtime < cutoff:
+                entry.unlink()
+        except FileNotFoundError:
+            pass
+
+def fetch_artifact(file_id: str, dest: Path, meta: dict = None) -> dict:
+    """Place the artifact at ``dest``, downloading only on a cache miss.
+
+    ``meta`` may come from a folder listing to save the metadata call.
+    Returns the metadata of the placed revision.
+    """
+    meta = meta or fetch_metadata(file_id)
+    md5 = meta.get("md5Checksum")
+    objects = CACHE_DIR / "objects"
+    objects.mkdir(parents=True, exist_ok=True)
+
+    cached = objects / md5 if md5 else None
+    if (cached is not None and cached.exists() and cached.stat().st_size == int(meta.get("size", -1))
+            and verify_file(cached, file_id, meta)):
+        print(f"Cache hit for {meta.get('name', file_id)} (md5 {md5}); skipping download.")
+        cached.touch()
+    else:
+        # http/local ids are paths; keep the partial file flat inside objects/
+        fresh = objects / f"{urllib.parse.quote(file_id, safe='')}.partial"
+        # Verified while streaming; nothing unverified reaches the cache
+        cached = objects / download_file(file_id, fresh, meta)["md5"]
+        fresh.replace(cached)
+        prune_cache(objects)
+
+    place_file(cached, dest)
+    return meta
+
+def write_manifest(work_dir: Path, file_id: str, meta: dict, path: Path):
+    manifest = {
+        "file_id": file_id,
+        "name": meta.get("name"),
+        "revision": meta.get("headRevisionId"),
+        "md5": meta.get("md5Checksum") or file_md5(path),
+        "app_properties": meta.get("appProperties") or {},
+        "size": path.stat().st_size,
+        "path": path.name,
+        "fetched_at": time.time(),
+    }
+    tmp = work_dir / "manifest.tmp"
+    tmp.write_text(json.dumps(manifest, indent=2))
+    tmp.replace(work_dir / "manifest.json")
+    return manifest
+
+def fresh_artifact(work_dir: Path, file_id: str, max_age: float = MANIFEST_MAX_AGE):
+    """Path of the artifact already in ``work_dir`` if its manifest is still fresh."""
+    try:
+        manifest = json.loads((work_dir / "manifest.json").read_text())
+    except (OSError, ValueError):
+        return None
+    path = work_dir / manifest.get("path", "")
+    age = time.time() - manifest.get("fetched_at", 0)
+    if manifest.get("file_id") != file_id or not 0 <= age <= max_age:
+        return None
+    if not path.is_file() or path.stat().st_size != manifest.get("size"):
+        return None
+    meta = {"md5Checksum": manifest.get("md5"), "appProperties": manifest.get("app_properties")}
+    if not verify_file(path, file_id, meta):
+        return None
+    return path
+
+def bundle_path(dest_dir: Path, rel: str):
+    """``dest_dir / rel`` if it stays inside ``dest_dir``, else None.
+
+    ``rel`` is built from Drive file names (or read back from the manifest),
+    so "..", absolute names and symlinked directories must not escape.
+    """
+    root = dest_dir.resolve()
+    path = (root / rel).resolve()
+    return path if root in path.parents else None
+
+def sync_folder(folder_id: str, dest_dir: Path, workers: int = SYNC_WORKERS) -> dict:
+    """Mirror a Drive folder into ``dest_dir``, fetching only changed files.
+
+    Unchanged files (same md5 as recorded in ``.sync_manifest.json``) are
+    left alone; changed ones go through the artifact cache and are swapped
+    in atomically, several at a time.
+    """
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = dest_dir / ".sync_manifest.json"
+    try:
+        previous = json.loads(manifest_path.read_text()).get("files", {})
+    except (OSError, ValueError):
+        previous = {}
+
+    remote = list_folder(folder_id)
+    unsafe = [rel for rel in remote if bundle_path(dest_dir, rel) is None]
+    if unsafe:
+        print(f"ERROR: bundle paths escape {dest_dir}: {', '.join(map(repr, unsafe))}", file=sys.stderr)
+        sys.exit(1)
+    changed = []
+    for rel, meta in remote.items():
+        local = bundle_path(dest_dir, rel)
+        known = previous.get(rel, {})
+        if (local.is_file() and known.get("md5") == meta.get("md5Checksum")
+                and local.stat().st_size == int(meta.get("size", -1))
+                and verify_file(local, meta["id"], meta)):
+            continue
+        changed.append((rel, meta))
+
+    def fetch(item):
+        rel, meta = item
+        local = bundle_path(dest_dir, rel)
+        local.parent.mkdir(parents=True, exist_ok=True)
+        fetch_artifact(meta["id"], local, meta)
+        return rel
+
+    changed_bytes = sum(int(meta.get("size", 0)) for _, meta in changed)
+    print(f"Bundle sync: {len(changed)} of {len(remote)} files changed ({changed_bytes} bytes).")
+    if changed:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(changed)))) as pool:
+            for rel in pool.map(fetch, changed):
+                print(f"  updated {rel}")
+
+    for rel in set(previous) - set(remote):
+        local = bundle_path(dest_dir, rel)
+        if local is None:
+            print(f"WARNING: not removing {rel!r}: outside {dest_dir}.", file=sys.stderr)
+            continue
+        local.unlink(missing_ok=True)
+        print(f"  removed {rel}")
+
+    manifest = {
+        "folder_id": folder_id,
+        "fetched_at": time.time(),
+        "files": {rel: {"id": meta["id"], "md5": meta.get("md5Checksum"),
+                        "revision": meta.get("headRevisionId"), "size": int(meta.get("size", 0)),
+                        "app_properties": meta.get("appProperties") or {}}
+                  for rel, meta in remote.items()},
+    }
+    tmp = manifest_path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest, indent=2))
+    tmp.replace(manifest_path)
+    return manifest
+
+def fresh_bundle(dest_dir: Path, folder_id: str, max_age: float = MANIFEST_MAX_AGE) -> bool:
+    """True if the synced bundle in ``dest_dir`` is recent and intact."""
+    try:
+        manifest = json.loads((dest_dir / ".sync_manifest.json").read_text())
+    except (OSError, ValueError):
+        return False
+    age = time.time() - manifest.get("fetched_at", 0)
+    if manifest.get("folder_id") != folder_id or not 0 <= age <= max_age:
+        return False
+    for rel, info in manifest.get("files", {}).items():
+        path = bundle_path(dest_dir, rel)
+        if path is None or not path.is_file() or path.stat().st_size != info.get("size"):
+            return False
+        meta = {"md5Checksum": info.get("md5"), "appProperties": info.get("app_properties")}
+        if not verify_file(path, info.get("id"), meta):
+            return False
+    return True
+
+def prepare_zip_bundle(archive: Path) -> Path:
+    """Return a zipimport-ready copy of a zipped generator bundle.
+
+    Every ``.py`` in the archive gets an unchecked hash-based ``.pyc`` next
+    to it (the layout zipimport looks for), compiled once per archive
+    content and interpreter, so ``python bundle.pyz`` imports straight
+    from the archive without extracting or compiling anything.  A missing
+    ``__main__.py`` is synthesised to run ``GENERATOR_ENTRY``.
+    """
+    with open(archive, "rb") as f:
+        digest = hashlib.file_digest(f, "sha256").hexdigest()
+    bundles = CACHE_DIR / "bundles"
+    bundles.mkdir(parents=True, exist_ok=True)
+    target = bundles / f"{digest[:32]}-{sys.implementation.cache_tag}.pyz"
+    if target.exists():
+        return target
+
+    tmp = target.with_name(target.name + ".tmp")
+    with zipfile.ZipFile(archive) as src, zipfile.ZipFile(tmp, "w", zipfile.ZIP_STORED) as dst:
+        names = set(src.namelist())
+        entries = {}
+        for info in src.infolist():
+            if info.filename.endswith(".pyc"):
+                continue  # stale bytecode from another interpreter
+            data = src.read(info)
+            dst.writestr(info, data)
+            if info.filename.endswith(".py"):
+                entries[info.filename] = data
+        if "__main__.py" not in names:
+            entry = Path(os.environ.get("GENERATOR_ENTRY", "generator.py")).stem
+            main_src = f"import runpy\nrunpy.run_module({entry!r}, run_name='__main__', alter_sys=True)\n".encode()
+            dst.writestr("__main__.py", main_src)
+            entries["__main__.py"] = main_src
+        for name, source in entries.items():
+            code = compile(source, f"{target}/{name}", "exec", dont_inherit=True)
+            header = importlib.util.MAGIC_NUMBER + (0b01).to_bytes(4, "little") + importlib.util.source_hash(source)
+            dst.writestr(name + "c", header + marshal.dumps(code))
+    tmp.replace(target)
+    prune_cache(bundles)
+    print(f"Prepared zip bundle {target.name} ({len(entries)} modules precompiled).")
+    return target
+
+BOOTSTRAP = Path(__file__).resolve().parent / "generator_boot.py"
+
+def compile_cached(script: Path) -> Path:
+    """Marshalled code object for ``script``, compiled once per content hash."""
+    source = script.read_bytes()
+    # The path is part of the key because it is baked into co_filename
+    digest = hashlib.sha256(str(script.resolve()).encode() + b"\0" + source).hexdigest()
+    codes = CACHE_DIR / "bytecode"
+    codes.mkdir(parents=True, exist_ok=True)
+    target = codes / f"{digest[:32]}-{sys.implementation.cache_tag}.bin"
+    if target.exists():
+        target.touch()
+        return target
+
+    code = compile(source, str(script.resolve()), "exec", dont_inherit=True)
+    tmp = target.with_name(target.name + ".tmp")
+    tmp.write_bytes(importlib.util.MAGIC_NUMBER + marshal.dumps(code))
+    tmp.replace(target)
+    prune_cache(codes)
+    print(f"Compiled {script.name} to bytecode cache {target.name}.")
+    return target
+
+def generator_spec(generator_path: Path) -> dict:
+    """What the child runs: the script and, for plain scripts, its cached code."""
+    if generator_path.suffix == ".pyz":
+        return {"script": str(generator_path.resolve())}
+    return {"script": str(generator_path.resolve()), "code": str(compile_cached(generator_path))}
+
+def generator_command(spec: dict) -> list:
+    """Interpreter command line for a cold generator child."""
+    if "code" in spec:
+        return [sys.executable, "-u", str(BOOTSTRAP), "--code", spec["code"], spec["script"]]
+    if spec.get("boot"):
+        return [sys.executable, "-u", str(BOOTSTRAP), spec["script"]]
+    return [sys.executable, "-u", spec["script"]]
+
+class ZygoteChild:
+    """Popen-like handle for a generator forked by the zygote."""
+
+    def __init__(self, zygote, pid):
+        self.zygote = zygote
+        self.pid = pid
+        self.returncode = None
+
+    def poll(self):
+        if self.returncode is None:
+            self._pump(0)
+        return self.returncode
+
+    def wait(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.poll() is None:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                raise subprocess.TimeoutExpired(f"zygote child {self.pid}", timeout)
+            self._pump(remaining)
+        return self.returncode
+
+    def _pump(self, timeout):
+        try:
+            self.zygote.pump(timeout)
+        except RuntimeError as e:
+            # The zygote is gone and nobody can reap our child any more: kill
+            # the orphan and report it as killed so the supervisor respawns
+            print(f"ERROR: {e}; killing orphaned generator {self.pid}.", file=sys.stderr)
+            try:
+                os.kill(self.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            self.returncode = self.zygote.exits.get(self.pid, -signal.SIGKILL)
+            return
+        self.returncode = self.zygote.exits.get(self.pid)
+
+    def send_signal(self, sig):
+        if self.poll() is None:
+            try:
+                os.kill(self.pid, sig)
+            except ProcessLookupError:
+                pass
+
+    def terminate(self):
+        self.send_signal(signal.SIGTERM)
+
+    def kill(self):
+        self.send_signal(signal.SIGKILL)
+
+class Zygote:
+    """Warm interpreter that preloads heavy modules and forks generators.
+
+    Started early (before the Drive fetch) so imports overlap with I/O;
+    ``spawn`` then forks an already-warm child in milliseconds.
+    """
+
+    def __init__(self, modules=PRELOAD_MODULES):
+        read_fd, write_fd = os.pipe()
+        self.proc = subprocess.Popen(
+            [sys.executable, "-u", str(BOOTSTRAP), "--zygote", str(write_fd), *filter(None, modules)],
+            stdin=subprocess.PIPE, pass_fds=(write_fd,), text=True)
+        os.close(write_fd)
+        # Raw fd plus our own buffer: a buffered reader could swallow a second
+        # message that the selector would then never report
+        self.control = read_fd
+        self.buffer = b""
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.control, selectors.EVENT_READ)
+        self.ready = False
+        self.pids = []
+        self.exits = {}
+
+    def pump(self, timeout=None) -> bool:
+        """Read one control message if one arrives within ``timeout``."""
+        while b"\n" not in self.buffer:
+            if not self.selector.select(timeout):
+                return False
+            chunk = os.read(self.control, 65536)
+            if not chunk:
+                raise RuntimeError("zygote exited unexpectedly")
+            self.buffer += chunk
+        line, self.buffer = self.buffer.split(b"\n", 1)
+        message = json.loads(line)
+        if "ready" in message:
+            self.ready = True
+        elif "pid" in message:
+            self.pids.append(message["pid"])
+        elif "exit" in message:
+            self.exits[message["exit"]] = message["status"]
+        return True
+
+    def spawn(self, spec: dict, env: dict, **streams) -> ZygoteChild:
+        """Fork a warm child; ``stdout``/``stderr`` may name fifos to write to."""
+        started = time.monotonic()
+        while not self.ready:
+            self.pump()
+        if started + 0.01 < time.monotonic():
+            print(f"Waited {time.monotonic() - started:.1f}s for the warm interpreter.")
+        known = len(self.pids)
+        self.proc.stdin.write(json.dumps({**spec, "argv": [], "env": env, **streams}) + "\n")
+        self.proc.stdin.flush()
+        while len(self.pids) == known:
+            self.pump()
+        return ZygoteChild(self, self.pids[-1])
+
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def close(self):
+        if self.proc.stdin and not self.proc.stdin.closed:
+            with contextlib.suppress(BrokenPipeError):
+                self.proc.stdin.close()
+        try:
+            self.proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+        self.selector.close()
+        os.close(self.control)
+
+def start_profiled(spec: dict, env: dict, work_dir: Path, logs):
+    """Cold start under ``-X importtime`` with output piped through the profiler.
+
+    The report is written as soon as the first loop tick is seen
+    (RUNNER_TICK_MARKER regex, default: first stdout line).
+    """
+    cmd = generator_command(spec)
+    cmd[1:1] = ["-X", "importtime"]
+    _PROFILE.mark("spawn")
+    proc = subprocess.Popen(cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    _PROFILE.watch(proc.stdout, logs.sink("stdout"), stdout=True)
+    _PROFILE.watch(proc.stderr, logs.sink("stderr"), stdout=False)
+
+    def report_on_tick():
+        _PROFILE.first_tick.wait()
+        _PROFILE.write(work_dir)
+    threading.Thread(target=report_on_tick, daemon=True).start()
+    return proc
+
+def start_generator(spec: dict, env: dict, work_dir: Path, logs, zygote=None):
+    """Start the generator with its output going through ``logs``."""
+    if zygote is not None:
+        fifos = {}
+        for stream in ("stdout", "stderr"):
+            path = work_dir / f"generator-{stream}.fifo"
+            path.unlink(missing_ok=True)
+            os.mkfifo(path)
+            logs.attach_fifo(path, stream)
+            fifos[stream] = str(path)
+        return zygote.spawn(spec, env, **fifos)
+    if _PROFILE is not None:
+        return start_profiled(spec, env, work_dir, logs)
+    proc = subprocess.Popen(generator_command(spec), env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    logs.attach(proc.stdout, "stdout")
+    logs.attach(proc.stderr, "stderr")
+    return proc
+
+def session_context_env(path: Path):
+    """Flatten the session context written by market_check.py into env vars."""
+    path = Path(os.environ.get("SESSION_CONTEXT_PATH", path))
+    try:
+        context = json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {}
+    env = {"SESSION_CONTEXT_PATH": str(path.resolve())}
+    for key, value in context.items():
+        env[f"SESSION_{key.upper()}"] = str(value).lower() if isinstance(value, bool) else str(value)
+    return env
+
+def resolve_generator(work_dir: Path, file_id: str, folder_id: str, reuse: bool,
+                      max_age: float = MANIFEST_MAX_AGE) -> Path:
+    """Fetch the generator (or reuse a fresh, intact copy) and return what to run."""
+    generator_path = work_dir / "generator.py"
+    if folder_id:
+        # Multi-file bundle: helpers, params and lookup tables next to the entry point
+        bundle_dir = work_dir / "bundle"
+        generator_path = bundle_dir / os.environ.get("GENERATOR_ENTRY", "generator.py")
+        if reuse and fresh_bundle(bundle_dir, folder_id, max_age):
+            print(f"Reusing bundle in {bundle_dir.resolve()} synced by --download-only.")
+        else:
+            print(f"Syncing private generator bundle from {source_label()}...")
+            with phase("download"):
+                sync_folder(folder_id, bundle_dir)
+        if not generator_path.is_file():
+            print(f"ERROR: bundle has no entry point {generator_path.name}.", file=sys.stderr)
+            sys.exit(1)
+    elif reuse and fresh_artifact(work_dir, file_id, max_age) == generator_path:
+        print(f"Reusing {generator_path.resolve()} fetched by --download-only (manifest fresh).")
+    else:
+        print(f"Fetching private generator script from {source_label()}...")
+        with phase("download"):
+            meta = fetch_artifact(file_id, generator_path)
+        write_manifest(work_dir, file_id, meta, generator_path)
+        print(f"Downloaded to {generator_path.resolve()}")
+
+    if zipfile.is_zipfile(generator_path):
+        # Bundle mode: the artifact is a zip run in place through zipimport
+        with phase("bundle prepare"):
+            generator_path = prepare_zip_bundle(generator_path)
+    return generator_path
+
+def restart_deadline():
+    """Epoch seconds of today's END_TIME_IST (clipped to the session), or None."""
+    try:
+        import market_check
+        clock = market_check.MarketClock()
+    except Exception as e:
+        print(f"WARNING: cannot resolve the trading window ({e}); crash restarts disabled.", file=sys.stderr)
+        return None
+    return clock.window_end_ns / 1e9 if clock.session is not None else None
+
+def latest_checkpoint(directory: Path):
+    """Most recently written checkpoint file in ``directory``, if any."""
+    try:
+        files = [p for p in directory.iterdir() if p.is_file() and not p.name.endswith(".tmp")]
+    except OSError:
+        return None
+    return max(files, key=lambda p: p.stat().st_mtime, default=None)
+
+def supervise(generator_path: Path, work_dir: Path, file_id: str, folder_id: str,
+              zygote=None, warm: bool = False, profile: bool = False) -> int:
+    """Run the generator, restarting it after a crash while the trading window is open.
+
+    Restarts reuse the verified artifact and cached bytecode (and fork from
+    the warm zygote when it is still up).  The child sees
+    GENERATOR_CHECKPOINT_DIR, GENERATOR_RESTART_COUNT and, on a restart,
+    GENERATOR_RESUME_FROM pointing at the newest checkpoint in that dir.
+    A clean exit or a SIGTERM/SIGINT to the runner ends supervision.
+    """
+    stop = threading.Event()
+    proc = None
+
+    def on_signal(signum, frame):
+        stop.set()
+        if proc is not None and signum == signal.SIGTERM:
+            try:
+                os.kill(proc.pid, signum)
+            except ProcessLookupError:
+                pass
+    signal.signal(signal.SIGTERM, on_signal)
+    signal.signal(signal.SIGINT, on_signal)
+
+    CHECKPOINT_DIR.mkdir(parents=True, exist_ok=True)
+    from runner_logs import LogPump
+    logs = LogPump()
+    sampler = None
+    if TELEMETRY_INTERVAL > 0 and os.path.isdir("/proc/self"):
+        from runner_telemetry import TelemetrySampler
+        TELEMETRY_PATH.unlink(missing_ok=True)
+        sampler = TelemetrySampler(TELEMETRY_PATH, TELEMETRY_INTERVAL)
+    restarts = attempt = 0
+    deadline = None
+    while True:
+        env = os.environ.copy()
+        env.update(session_context_env(work_dir / "session_context.json"))
+        env["GENERATOR_CHECKPOINT_DIR"] = str(CHECKPOINT_DIR.resolve())
+        env["GENERATOR_RESTART_COUNT"] = str(restarts)
+        if profile:
+            env["GENERATOR_PROFILE_DIR"] = str(PROFILE_DIR.resolve())
+            env["GENERATOR_PROFILE_INTERVAL"] = PROFILE_INTERVAL
+            env["GENERATOR_PROFILE_WINDOW"] = PROFILE_WINDOW
+        checkpoint = latest_checkpoint(CHECKPOINT_DIR) if restarts else None
+        if checkpoint is not None:
+            env["GENERATOR_RESUME_FROM"] = str(checkpoint.resolve())
+        with phase("compile"):
+            spec = generator_spec(generator_path)
+        if profile:
+            spec["boot"] = True  # the sampler is started by generator_boot.py
+        if warm and (zygote is None or not zygote.alive()):
+            if zygote is not None:
+                zygote.close()
+            zygote = Zygote()
+
+        print(f"Running {generator_path.name} ..." if not restarts else
+              f"Restarting {generator_path.name}" + (f" from {checkpoint.name}" if checkpoint else "") + " ...")
+        started = time.monotonic()
+        proc = None
+        if zygote is not None:
+            try:
+                proc = start_generator(spec, env, work_dir, logs, zygote)
+            except (RuntimeError, OSError) as e:
+                # Died while preloading (native crash, OOM): run cold for the rest of the day
+                print(f"WARNING: warm interpreter failed ({e}); starting the generator cold.", file=sys.stderr)
+                logs.drain()
+                zygote.close()
+                zygote, warm = None, False
+        if proc is None:
+            proc = start_generator(spec, env, work_dir, logs)
+        if sampler is not None:
+            sampler.start(proc.pid)
+        returncode = proc.wait()
+        if sampler is not None:
+            sampler.stop()
+        if _PROFILE is not None:
+            _PROFILE.finish(work_dir)
+        logs.drain()
+
+        if returncode == 0 or stop.is_set():
+            break
+        logs.notify_failure(returncode)
+        ran = time.monotonic() - started
+        if ran >= RESTART_STABLE_SECONDS:
+            attempt = 0
+        if restarts >= RESTART_MAX:
+            print(f"Generator exited with {returncode}; giving up after {restarts} restarts.", file=sys.stderr)
+            break
+        if deadline is None:
+            deadline = restart_deadline()
+        delay = min(RESTART_BACKOFF_MAX, RESTART_BACKOFF_BASE * 2 ** attempt)
+        if deadline is None or time.time() + delay >= deadline:
+            print(f"Generator exited with {returncode}; trading window closed, not restarting.", file=sys.stderr)
+            break
+        print(f"Generator exited with {returncode} after {ran:.0f}s; restarting in {delay:.0f}s "
+              f"({restarts + 1}/{RESTART_MAX}).", file=sys.stderr)
+        if stop.wait(delay):
+            break
+        # Re-verifies the artifact against its manifest; only re-fetches if it is gone or damaged
+        generator_path = resolve_generator(work_dir, file_id, folder_id, reuse=True, max_age=float("inf"))
+        restarts += 1
+        attempt += 1
+
+    if zygote is not None:
+        zygote.close()
+    logs.close()
+    if sampler is not None:
+        print(sampler.summary())
+    return returncode
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--download-only", action="store_true")
     parser.add_argument("--run", action="store_true")
+    parser.add_argument("--warm", action="store_true", default=os.environ.get("RUNNER_WARM_START") == "1",
+                        help="preload heavy dependencies in a zygote and fork the generator from it")
+    parser.add_argument("--wait-until-open", action="store_true",
+                        help="after fetching, sleep to the market open (MARKET_WAIT_MAX_SECONDS) before starting "
+                             "the generator; with --warm the zygote preloads during the wait")
+    parser.add_argument("--profile", action="store_true",
+                        help="sample the CPU-using stacks of every generator thread; writes collapsed stacks "
+                             "per window to .runner_tmp/profiles")
+    parser.add_argument("--startup-profile", action="store_true",
+                        help="time start-up phases and child imports; writes .runner_tmp/startup_profile*.{txt,json}")
     args = parser.parse_args()
 
-    file_id = os.environ.get("GDRIVE_FILE_ID")
-    if not file_id:
-        print("ERROR: GDRIVE_FILE_ID not set.", file=sys.stderr)
-        sys.exit(1)
+    global _PROFILE
+    if args.startup_profile:
+        from runner_profile import StartupProfile
+        # A separate file for --download-only so the --run step does not overwrite it
+        stem = "startup_profile" if args.run else "startup_profile_download"
+        _PROFILE = StartupProfile(os.environ.get("RUNNER_TICK_MARKER"), stem)
+        if args.warm:
+            print("--startup-profile measures the cold path; ignoring --warm.")
+            args.warm = False
 
     # Save generator script only in runner temp space (not repo)
     work_dir = Path.cwd() / ".runner_tmp"
     work_dir.mkdir(parents=True, exist_ok=True)
-    generator_path = work_dir / "generator.py"
+    try:
+        execute(args, work_dir)
+    finally:
+        # --download-only profiles end here; under --run supervise() has
+        # usually written it already (write() is once-only)
+        if _PROFILE is not None:
+            _PROFILE.write(work_dir)
+
+def execute(args, work_dir: Path):
+    file_id = os.environ.get("GDRIVE_FILE_ID")
+    folder_id = os.environ.get("GDRIVE_FOLDER_ID")
+    if not (file_id or folder_id):
+        print("ERROR: GDRIVE_FILE_ID (or GDRIVE_FOLDER_ID) not set.", file=sys.stderr)
+        sys.exit(1)
 
-    print("Downloading private generator script from Google Drive...")
-    download_file(file_id, generator_path)
-    print(f"Downloaded to {generator_path.resolve()}")
+    # Warm the interpreter while the artifact is fetched
+    zygote = Zygote() if args.run and args.warm else None
+
+    generator_path = resolve_generator(work_dir, file_id, folder_id, reuse=args.run)
 
     if args.download_only and not args.run:
         return
 
+    if args.run and args.wait_until_open:
+        import market_check
+        max_wait = float(os.environ.get("MARKET_WAIT_MAX_SECONDS", "3600"))
+        print("Waiting for the market to open" + (" (warm interpreter preloading)..." if zygote else "..."))
+        with phase("market wait"):
+            opened = market_check.wait_until_open(max_wait=max_wait)
+        if not opened:
+            print("Market does not open within MARKET_WAIT_MAX_SECONDS; not starting the generator.")
+            if zygote is not None:
+                zygote.close()
+            return
+        # The market step exported its context before the bell; refresh it
+        market_check.export_session_context(market_check.session_context(True), work_dir / "session_context.json")
+
     if args.run:
-        print("Running generator.py ...")
-        env = os.environ.copy()
-        cmd = [sys.executable, "-u", str(generator_path)]
-        proc = subprocess.Popen(cmd, env=env)
-        returncode = proc.wait()
-        sys.exit(returncode)
+        sys.exit(supervise(generator_path, work_dir, file_id, folder_id, zygote, args.warm, args.profile))
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,203 @@
+# scripts/runner_logs.py
+#
+# Log pump for the generator child: reader threads drain its stdout/stderr
+# pipes into a bounded ring buffer and a console queue, a writer thread
+# flushes the queue in batches, and on failure the buffered tail goes to
+# Telegram as a single message. Readers never wait on the console, so the
+# generator never blocks on log I/O; if the console falls behind, the oldest
+# queued lines are dropped (and counted) instead.
+import os
+import re
+import sys
+import json
+import time
+import threading
+import urllib.parse
+import urllib.request
+from collections import Counter, deque
+
+LOG_BUFFER_LINES = int(os.environ.get("RUNNER_LOG_BUFFER", "2000"))
+LOG_TAIL_LINES = int(os.environ.get("RUNNER_LOG_TAIL", "40"))
+LOG_FLUSH_INTERVAL = float(os.environ.get("RUNNER_LOG_FLUSH", "0.5"))
+LOG_BATCH_LINES = 500      # flush early once this many lines are queued
+LOG_MAX_PENDING = 20_000
+TELEGRAM_MAX_CHARS = 4096
+
+LEVEL_RE = re.compile(r"^\s*\[?(DEBUG|INFO|WARNING|WARN|ERROR|CRITICAL)\]?[\s:-]+(.*)$")
+ANNOTATIONS = {"WARNING": "::warning::", "ERROR": "::error::", "CRITICAL": "::error::"}
+
+
+def parse_line(line):
+    """``(level, text)`` for a structured line, else ``(None, line)``.
+
+    Understands JSON objects with ``level``/``msg`` (or ``message``) keys and
+    ``LEVEL: message`` / ``[LEVEL] message`` prefixes.
+    """
+    if line.startswith("{"):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        if isinstance(record, dict) and ("msg" in record or "message" in record):
+            level = str(record.pop("level", "INFO")).upper()
+            text = str(record.pop("msg", None) or record.pop("message", ""))
+            extra = " ".join(f"{k}={v}" for k, v in record.items())
+            return level, f"{text} {extra}".rstrip()
+    m = LEVEL_RE.match(line)
+    if m:
+        level = "WARNING" if m.group(1) == "WARN" else m.group(1)
+        return level, m.group(2)
+    return None, line
+
+
+class LogPump:
+    def __init__(self, stdout=None, stderr=None):
+        self.consoles = {"stdout": stdout or sys.stdout, "stderr": stderr or sys.stderr}
+        self.annotate = os.environ.get("GITHUB_ACTIONS") == "true"
+        self.tail = deque(maxlen=LOG_BUFFER_LINES)
+        self.pending = deque()
+        self.dropped = 0
+        self.levels = Counter()
+        self.readers = []
+        self._fifos = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()   # one flusher at a time, so batches stay in order
+        self._wake = threading.Event()
+        self._closed = False
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def feed(self, line, stream="stdout"):
+        line = line.rstrip("\n")
+        level, text = parse_line(line)
+        # The console gets the line as written (only an Actions annotation is
+        # prepended); the parsed form is for the level counts and the tail.
+        prefix = ANNOTATIONS.get(level, "") if self.annotate else ""
+        out = f"{prefix}{line}\n"
+        with self._lock:
+            if level is not None:
+                self.levels[level] += 1
+            self.tail.append(text if level is None else f"{level} {text}")
+            self.pending.append((stream, out))
+            if len(self.pending) > LOG_MAX_PENDING:
+                self.pending.popleft()
+                self.dropped += 1
+            elif len(self.pending) == LOG_BATCH_LINES:
+                self._wake.set()
+
+    def sink(self, stream):
+        """File-like ``write``/``flush`` target that feeds this pump."""
+        pump = self
+
+        class Sink:
+            def write(self, line):
+                pump.feed(line, stream)
+
+            def flush(self):
+                pass
+        return Sink()
+
+    def attach(self, pipe, stream):
+        """Pump a binary pipe on its own reader thread."""
+        def read():
+            for raw in iter(pipe.readline, b""):
+                self.feed(raw.decode("utf-8", "replace"), stream)
+            pipe.close()
+        self._start_reader(read)
+
+    def attach_fifo(self, path, stream):
+        """Pump a named pipe a forked child opens as its stdout/stderr."""
+        def read():
+            with open(path, "rb") as pipe:   # blocks until the writer opens it
+                for raw in iter(pipe.readline, b""):
+                    self.feed(raw.decode("utf-8", "replace"), stream)
+        self._fifos[path] = stream
+        self._start_reader(read)
+
+    def _start_reader(self, target):
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        self.readers.append(thread)
+
+    def drain(self, timeout=2.0):
+        """After the child exits: finish reading its pipes and flush the console."""
+        for path in list(self._fifos):
+            try:
+                # Unblocks a reader still waiting for a child that never opened the fifo
+                os.close(os.open(path, os.O_WRONLY | os.O_NONBLOCK))
+            except OSError:
+                pass
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+        deadline = time.monotonic() + timeout
+        for thread in self.readers:
+            # Bounded: a grandchild may still hold the write end open
+            thread.join(max(0.0, deadline - time.monotonic()))
+        self.readers = [t for t in self.readers if t.is_alive()]
+        self._fifos.clear()
+        self.flush()
+
+    def flush(self):
+        # The writer thread and drain()/close() both flush: taking the batch and
+        # writing it under one lock keeps their batches from interleaving.
+        # Feeders only ever wait on _lock, never on the console.
+        with self._write_lock:
+            with self._lock:
+                batch, self.pending = self.pending, deque()
+                dropped, self.dropped = self.dropped, 0
+            if dropped:
+                batch.appendleft(("stderr", f"[runner] console fell behind; dropped {dropped} log lines\n"))
+            # One write per run of consecutive lines from the same stream
+            while batch:
+                stream = batch[0][0]
+                chunk = []
+                while batch and batch[0][0] == stream:
+                    chunk.append(batch.popleft()[1])
+                console = self.consoles[stream]
+                console.write("".join(chunk))
+                console.flush()
+
+    def _write_loop(self):
+        while not self._closed:
+            self._wake.wait(LOG_FLUSH_INTERVAL)
+            self._wake.clear()
+            self.flush()
+
+    def close(self):
+        self.drain()
+        self._closed = True
+        self._wake.set()  # the writer exits after one last flush
+        self._writer.join()
+
+    def tail_text(self, lines=LOG_TAIL_LINES):
+        with self._lock:
+            return list(self.tail)[-lines:]
+
+    def notify_failure(self, returncode, lines=LOG_TAIL_LINES):
+        """Send the last ``lines`` lines to TELEGRAM_CHAT_ID as one message.
+
+        Level counts restart after each call, so a restarted generator's
+        report only counts its own lines.
+        """
+        with self._lock:
+            counts = ", ".join(f"{n} {level}" for level, n in sorted(self.levels.items())) or "no structured lines"
+            self.levels.clear()
+        token = os.environ.get("TELEGRAM_BOT_TOKEN")
+        chat_id = os.environ.get("TELEGRAM_CHAT_ID")
+        if not (token and chat_id):
+            return False
+        header = f"Generator exited with {returncode} ({counts}). Last lines:\n"
+        body = "\n".join(self.tail_text(lines))
+        # Telegram caps a message at 4096 chars; keep the newest output
+        body = body[-(TELEGRAM_MAX_CHARS - len(header)):]
+        data = urllib.parse.urlencode({"chat_id": chat_id, "text": header + body}).encode()
+        request = urllib.request.Request(f"https://api.telegram.org/bot{token}/sendMessage", data=data)
+        try:
+            with urllib.request.urlopen(request, timeout=10) as resp:
+                resp.read()
+        except OSError as e:
+            print(f"WARNING: could not send failure log to Telegram: {e}", file=sys.stderr)
+            return False
+        return True
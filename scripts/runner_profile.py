@@ -0,0 +1,132 @@
+# scripts/runner_profile.py
+#
+# Start-up phase profiler behind `runner.py --startup-profile`: runner phases
+# are timed in-process, the generator runs under `-X importtime`, and the
+# first loop tick is taken from its output. Produces a ranked text report
+# and a Chrome trace-event JSON (open in chrome://tracing or Perfetto).
+import os
+import re
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)\s*$")
+# Keep in sync with generator_boot.IMPORTTIME_MARKER
+BOOT_MARKER = "generator_boot: bootstrap imports done"
+
+
+class StartupProfile:
+    def __init__(self, tick_marker=None, stem="startup_profile"):
+        self.stem = stem
+        self.t0 = time.perf_counter_ns()
+        self.spans = []      # (name, category, start_ns, end_ns)
+        self.imports = []    # (module, self_us, cumulative_us, end_ns)
+        self.boot_imports = []   # the same, for interpreter/bootstrap imports
+        self.marks = {}
+        self.tick_marker = re.compile(tick_marker) if tick_marker else None
+        self.first_tick = threading.Event()
+        self._lock = threading.Lock()
+        self._pumps = []
+        self._written = False
+
+    def now(self):
+        return time.perf_counter_ns() - self.t0
+
+    @contextmanager
+    def phase(self, name, category="runner"):
+        start = self.now()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.spans.append((name, category, start, self.now()))
+
+    def mark(self, name):
+        with self._lock:
+            self.marks.setdefault(name, self.now())
+
+    def watch(self, stream, sink, stdout):
+        """Forward a child pipe to ``sink``, swallowing importtime lines."""
+        def pump():
+            for raw in iter(stream.readline, b""):
+                line = raw.decode("utf-8", "replace")
+                m = IMPORTTIME_RE.match(line)
+                if m:
+                    if len(m.group(3)) == 1:  # top-level import (nested ones are indented)
+                        with self._lock:
+                            self.imports.append((m.group(4), int(m.group(1)), int(m.group(2)), self.now()))
+                    continue
+                if line.startswith("import time: self [us]"):
+                    continue
+                if line.rstrip("\n") == BOOT_MARKER:
+                    # Everything so far was the interpreter's and the bootstrap's
+                    with self._lock:
+                        self.boot_imports, self.imports = self.imports, []
+                    continue
+                sink.write(line)
+                sink.flush()
+                if stdout and not self.first_tick.is_set():
+                    if self.tick_marker is None or self.tick_marker.search(line):
+                        self.mark("first tick")
+                        self.first_tick.set()
+            stream.close()
+        thread = threading.Thread(target=pump, daemon=True)
+        thread.start()
+        self._pumps.append(thread)
+        return thread
+
+    def ranked(self):
+        rows = [(end - start, name, category) for name, category, start, end in self.spans]
+        rows += [(cum * 1000, f"import {mod}", "import") for mod, _, cum, _ in self.imports]
+        if "spawn" in self.marks and "first tick" in self.marks:
+            rows.append((self.marks["first tick"] - self.marks["spawn"], "spawn -> first tick", "child"))
+        return sorted(rows, reverse=True)
+
+    def report(self, top=25):
+        lines = [f"Start-up profile (t=0 at runner start)"]
+        for name in ("spawn", "first tick"):
+            if name in self.marks:
+                lines.append(f"  {name:<28}{self.marks[name] / 1e6:>10.1f} ms")
+        if self.boot_imports:
+            boot_us = sum(cum for _, _, cum, _ in self.boot_imports)
+            lines.append(f"  {'bootstrap imports (unranked)':<28}{boot_us / 1e3:>10.1f} ms")
+        lines.append(f"{'rank':<6}{'phase':<44}{'ms':>10}")
+        for rank, (dur, name, _) in enumerate(self.ranked()[:top], 1):
+            lines.append(f"{rank:<6}{name[:43]:<44}{dur / 1e6:>10.1f}")
+        return "\n".join(lines)
+
+    def trace(self):
+        pid = os.getpid()
+        events = []
+        for name, category, start, end in self.spans:
+            events.append({"name": name, "cat": category, "ph": "X", "pid": pid, "tid": 1,
+                           "ts": start / 1000, "dur": (end - start) / 1000})
+        for category, imports in (("boot import", self.boot_imports), ("import", self.imports)):
+            for mod, self_us, cum_us, end in imports:
+                # importtime reports on completion; back-date the span by its duration
+                events.append({"name": mod, "cat": category, "ph": "X", "pid": pid, "tid": 2,
+                               "ts": end / 1000 - cum_us, "dur": cum_us, "args": {"self_us": self_us}})
+        for name, at in self.marks.items():
+            events.append({"name": name, "ph": "i", "s": "g", "pid": pid, "tid": 1, "ts": at / 1000})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def finish(self, out_dir: Path):
+        """Drain the child pipes and write the report if no tick wrote it."""
+        for thread in self._pumps:
+            thread.join()
+        self.write(out_dir)
+
+    def write(self, out_dir: Path):
+        with self._lock:
+            if self._written:
+                return
+            self._written = True
+        out_dir.mkdir(parents=True, exist_ok=True)
+        report = self.report()
+        (out_dir / f"{self.stem}.txt").write_text(report + "\n")
+        (out_dir / f"{self.stem}.json").write_text(json.dumps(self.trace()))
+        print(report, file=sys.stderr)
+        print(f"Start-up trace written to {out_dir / self.stem}.json", file=sys.stderr)
@@ -0,0 +1,129 @@
+# scripts/runner_telemetry.py
+#
+# /proc sampler for the generator child: CPU time, RSS, threads, open fds and
+# context switches every RUNNER_TELEMETRY_INTERVAL seconds, one compact JSON
+# line per sample, plus a percentile summary when the run ends. Linux only;
+# elsewhere the sampler quietly does nothing.
+import os
+import json
+import math
+import time
+import threading
+from pathlib import Path
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def read_proc(pid):
+    """One raw sample of ``pid`` from /proc, or None once it is gone."""
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            stat = f.read()
+        with open(f"/proc/{pid}/status", "rb") as f:
+            status = f.read()
+        fds = len(os.listdir(f"/proc/{pid}/fd"))
+    except (FileNotFoundError, ProcessLookupError):
+        return None
+    # Fields after "(comm)": comm may contain spaces and parentheses
+    rest = stat[stat.rindex(b")") + 2:].split()
+    switches = {}
+    for line in status.splitlines():
+        if line.startswith((b"voluntary_ctxt_switches", b"nonvoluntary_ctxt_switches")):
+            key, value = line.split(b":")
+            switches[key[:2].decode()] = int(value)
+    return {
+        "cpu": (int(rest[11]) + int(rest[12])) / CLOCK_TICKS,   # utime + stime, seconds
+        "rss": int(rest[21]) * PAGE_SIZE,
+        "thr": int(rest[17]),
+        "fds": fds,
+        "vcs": switches.get("vo", 0),
+        "ics": switches.get("no", 0),
+    }
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return 0
+    return values[max(0, math.ceil(q / 100 * len(values)) - 1)]
+
+
+class TelemetrySampler:
+    """Samples one child process on a daemon thread into a JSONL file.
+
+    Lines are appended (``{"t", "pid", "cpu", "rss", "thr", "fds", "vcs",
+    "ics"}``), so a restarted generator keeps writing to the same file under
+    its new pid. Samples are also kept in memory for ``summary``.
+    """
+
+    def __init__(self, path: Path, interval: float):
+        self.path = path
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, pid):
+        self.stop()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(pid,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self, pid):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a", buffering=1) as out:
+            while True:
+                sample = read_proc(pid)
+                if sample is None:
+                    return
+                sample = {"t": round(time.time(), 3), "pid": pid, **sample}
+                self.samples.append(sample)
+                out.write(json.dumps(sample, separators=(",", ":")) + "\n")
+                if self._stop.wait(self.interval):
+                    return
+
+    def rates(self):
+        """Per-interval CPU utilisation (%) and context switches per second."""
+        cpu, vcs, ics = [], [], []
+        for prev, cur in zip(self.samples, self.samples[1:]):
+            dt = cur["t"] - prev["t"]
+            if cur["pid"] != prev["pid"] or dt <= 0:
+                continue
+            cpu.append(100 * (cur["cpu"] - prev["cpu"]) / dt)
+            vcs.append((cur["vcs"] - prev["vcs"]) / dt)
+            ics.append((cur["ics"] - prev["ics"]) / dt)
+        return cpu, vcs, ics
+
+    def summary(self):
+        if not self.samples:
+            return "Telemetry: no samples collected."
+        cpu, vcs, ics = self.rates()
+        series = {
+            "cpu %": cpu,
+            "rss MiB": [s["rss"] / 2**20 for s in self.samples],
+            "threads": [s["thr"] for s in self.samples],
+            "open fds": [s["fds"] for s in self.samples],
+            "vol. switches/s": vcs,
+            "invol. switches/s": ics,
+        }
+        span = self.samples[-1]["t"] - self.samples[0]["t"]
+        lines = [f"Telemetry: {len(self.samples)} samples over {span / 60:.1f} min -> {self.path}",
+                 f"{'':<20}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}"]
+        for name, values in series.items():
+            values = sorted(values)
+            row = [percentile(values, 50), percentile(values, 95), percentile(values, 99), values[-1] if values else 0]
+            lines.append(f"{name:<20}" + "".join(f"{v:>10.1f}" for v in row))
+        # Memory growth within the last process (restarts reset RSS)
+        last = [s for s in self.samples if s["pid"] == self.samples[-1]["pid"]]
+        hours = (last[-1]["t"] - last[0]["t"]) / 3600
+        if hours > 0:
+            growth = (last[-1]["rss"] - last[0]["rss"]) / 2**20
+            lines.append(f"rss growth: {growth:+.1f} MiB ({growth / hours:+.1f} MiB/h)")
+        return "\n".join(lines)
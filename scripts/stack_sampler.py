@@ -0,0 +1,164 @@
+# scripts/stack_sampler.py
+#
+# Stdlib CPU sampling profiler for the generator, started by generator_boot.py
+# when `runner.py --profile` sets GENERATOR_PROFILE_DIR. Every
+# GENERATOR_PROFILE_INTERVAL seconds a daemon thread reads each thread's own
+# CPU clock and records the stack of every thread that used CPU since the
+# last tick, weighted by how much, under a "thread:<name>" root frame; so CPU
+# burnt in feed/websocket/HTTP threads is charged to their code, not to
+# wherever the main thread is parked. Where per-thread CPU clocks are missing
+# (non-Linux) it falls back to ITIMER_PROF/SIGPROF, which can only see the
+# main thread. Samples are bucketed into wall-clock windows
+# (GENERATOR_PROFILE_WINDOW seconds, market time zone) and each window is
+# written as a collapsed-stack file for flamegraph.pl, speedscope or inferno:
+#
+#   <dir>/<YYYY-MM-DD_HHMM>-<pid>.folded    "thread:name;frame;frame count" lines
+#
+# Idle time produces no samples, so windows with no CPU use produce no file.
+import os
+import sys
+import time
+import atexit
+import signal
+import zoneinfo
+import datetime
+import threading
+from collections import Counter
+from pathlib import Path
+
+BOOTSTRAP = str(Path(__file__).resolve().with_name("generator_boot.py"))
+
+
+class StackSampler:
+    def __init__(self, out_dir: Path, interval=0.01, window=300):
+        self.out_dir = out_dir
+        self.interval = interval
+        self.window = window
+        self.tz = zoneinfo.ZoneInfo(os.environ.get("TIMEZONE", "Asia/Kolkata"))
+        self.counts = Counter()
+        self.bucket = None
+        self.samples = 0
+        self.handler_ns = 0
+        self.started = time.perf_counter_ns()
+        self.per_thread = hasattr(time, "pthread_getcpuclockid")
+        self._labels = {}
+        self._cpu = {}       # thread ident -> CPU seconds at the last tick
+        self._names = {}     # thread ident -> name
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        if self.per_thread:
+            self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+            self._thread.start()
+        else:
+            signal.signal(signal.SIGPROF, self._sample_main)
+            signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        atexit.register(self.stop)
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        elif not self.per_thread:
+            signal.setitimer(signal.ITIMER_PROF, 0, 0)
+            signal.signal(signal.SIGPROF, signal.SIG_IGN)
+        self.flush()
+        elapsed = time.perf_counter_ns() - self.started
+        overhead = 100 * self.handler_ns / elapsed if elapsed else 0
+        scope = "all threads" if self.per_thread else "main thread only"
+        print(f"stack sampler: {self.samples} samples ({scope}), {overhead:.2f}% overhead, output in {self.out_dir}",
+              file=sys.stderr)
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            t0 = time.perf_counter_ns()
+            self._roll_bucket()
+            frames = sys._current_frames()
+            frames.pop(own, None)
+            for ident, frame in frames.items():
+                weight = self._cpu_ticks(ident)
+                if weight:
+                    self._count(ident, frame, weight)
+            if len(self._cpu) > len(frames):
+                self._cpu = {ident: self._cpu[ident] for ident in frames if ident in self._cpu}
+            self.handler_ns += time.perf_counter_ns() - t0
+
+    def _sample_main(self, signum, frame):
+        t0 = time.perf_counter_ns()
+        self._roll_bucket()
+        self._count(threading.main_thread().ident, frame, 1)
+        self.handler_ns += time.perf_counter_ns() - t0
+
+    def _roll_bucket(self):
+        bucket = int(time.time() // self.window)
+        if bucket != self.bucket:
+            self.flush()
+            self.bucket = bucket
+
+    def _cpu_ticks(self, ident):
+        """Intervals of CPU ``ident`` used since the last tick (at least 1 if any)."""
+        try:
+            cpu = time.clock_gettime(time.pthread_getcpuclockid(ident))
+        except (OSError, OverflowError):
+            return 0
+        used = cpu - self._cpu.get(ident, cpu)
+        self._cpu[ident] = cpu
+        return max(1, round(used / self.interval)) if used > 0 else 0
+
+    def _count(self, ident, frame, weight):
+        # Key on code objects (cheap, hashable); labels are built at flush time
+        stack = []
+        while frame is not None:
+            stack.append(frame.f_code)
+            frame = frame.f_back
+        self.counts[self._thread_name(ident), tuple(stack)] += weight
+        self.samples += weight
+
+    def _thread_name(self, ident):
+        name = self._names.get(ident)
+        if name is None:
+            self._names = {t.ident: t.name for t in threading.enumerate()}
+            name = self._names.setdefault(ident, str(ident))
+        return name
+
+    def label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        return label
+
+    def flush(self):
+        if not self.counts:
+            return
+        counts, self.counts = self.counts, Counter()
+        start = datetime.datetime.fromtimestamp(self.bucket * self.window, self.tz)
+        path = self.out_dir / f"{start:%Y-%m-%d_%H%M}-{os.getpid()}.folded"
+        lines = []
+        for (thread, stack), n in counts.most_common():
+            # Root first, ';' separated: the collapsed-stack convention. The
+            # bootstrap's own frames sit under every stack and are dropped.
+            frames = [code for code in reversed(stack) if code.co_filename != BOOTSTRAP]
+            if not frames:
+                continue
+            labels = [f"thread:{thread}", *(self.label(code) for code in frames)]
+            lines.append(";".join(label.replace(";", ":") for label in labels) + f" {n}\n")
+        with open(path, "a") as f:
+            f.writelines(lines)
+
+
+def start_from_env():
+    """Start sampling if GENERATOR_PROFILE_DIR is set; returns the sampler or None."""
+    out_dir = os.environ.get("GENERATOR_PROFILE_DIR")
+    if not out_dir or not (hasattr(time, "pthread_getcpuclockid") or hasattr(signal, "setitimer")):
+        return None
+    sampler = StackSampler(
+        Path(out_dir),
+        interval=float(os.environ.get("GENERATOR_PROFILE_INTERVAL", "0.01")),
+        window=float(os.environ.get("GENERATOR_PROFILE_WINDOW", "300")),
+    )
+    sampler.start()
+    return sampler